@@ -1,10 +1,52 @@
 # -*- coding: utf-8 -*-
 #!/usr/bin/env python
 
+from __future__ import print_function
 import argparse
 import os
+import threading
+from itertools import chain
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
 from leiden import file_io
-from leiden import leiden_database
+
+# Genes are downloaded concurrently, as extraction time is dominated by waiting on the database server.
+# Each gene can download leiden_database.PAGE_DOWNLOAD_THREADS pages at once, the connection pool is sized for both
+# so every thread can keep its connection alive.
+DOWNLOAD_THREADS = 8
+
+# Pages cached with --cache are downloaded again once they are older than this many seconds
+CACHE_EXPIRE_AFTER = 24 * 60 * 60
+
+# Seconds between checks for Ctrl-C while waiting for genes to finish (waits without a timeout can not be interrupted
+# under Python 2)
+RESULT_POLL_INTERVAL = 0.5
+
+
+class DownloadStopped(Exception):
+    """
+    Raised in a gene download when the run has been stopped (such as with Ctrl-C) before the gene was complete.
+    """
+    pass
+
+
+def _rows_until_stopped(rows, stop_event):
+    """
+    Generates rows until stop_event is set.
+
+    @param rows: rows of a table
+    @type rows: iterable of lists
+    @param stop_event: event set when the run is stopped
+    @type stop_event: threading.Event
+    @return: the rows, one at a time
+    @rtype: generator of lists
+    @raise: DownloadStopped if stop_event is set before all rows have been generated
+    """
+
+    for row in rows:
+        if stop_event.is_set():
+            raise DownloadStopped('Download stopped before gene was complete')
+        yield row
 
 
 def extract_data(database, gene_id):
@@ -15,20 +57,69 @@ def extract_data(database, gene_id):
     @type leiden_database: LeidenDatabase
     @param gene_id: a string with the Gene ID of the gene to be extracted.
     @type gene_id: string
-    @return: tuple containing table entries, column labels.
-    @rtype: tuple containing 2D list and list respectively
+    @return: tuple containing table entries, column labels. Table entries are generated one row at a time as the pages
+    of the table are downloaded.
+    @rtype: tuple containing generator of lists and list respectively
     @raise: IOError if could not get data
     """
 
+    gene = database.get_gene_data(gene_id)
+    column_labels = gene.columns()
+    table_entries = gene.iter_variants()
+
+    return table_entries, column_labels
+
+
+def save_gene_data(database, gene_id, output_directory, stop_event=None):
+    """
+    Extracts variant table data for given gene in leiden_database and saves it to <gene_id>.txt in output_directory.
+    If stop_event is set while the gene is being downloaded, the download stops at the next row and no file is saved.
+
+    @param database: database containing tables of variant data for specified gene_id
+    @type database: LeidenDatabase
+    @param gene_id: a string with the Gene ID of the gene to be extracted.
+    @type gene_id: string
+    @param output_directory: directory to save the file to
+    @type output_directory: string
+    @param stop_event: optional event that stops the download when set
+    @type stop_event: threading.Event
+    @return: gene_id and error message if data could not be extracted or saved (None otherwise)
+    @rtype: tuple of strings
+    """
+
     try:
-        gene = database.get_gene_data(gene_id)
-        column_labels = gene.columns()
-        table_entries = gene.variants()
+        table_data, column_labels = extract_data(database, gene_id)
+        output_file_name = os.path.join(output_directory, gene_id + '.txt')
+
+        # Stream the labels followed by the table rather than shifting every row to insert the labels
+        rows = chain([column_labels], table_data)
 
+        if stop_event is not None:
+            rows = _rows_until_stopped(rows, stop_event)
+
+        file_io.write_table_to_file(output_file_name, rows)
     except Exception as e:
-        raise e
+        # Any failure only affects this gene. Ctrl-C (KeyboardInterrupt) is not an Exception and still stops the run.
+        # Include the exception type, parsing errors such as IndexError often have no message of their own.
+        return gene_id, type(e).__name__ + ': ' + str(e)
 
-    return table_entries, column_labels
+    return gene_id, None
+
+
+def is_saved(gene_id, output_directory):
+    """
+    Checks whether the data for a gene has already been saved to output_directory by save_gene_data.
+
+    @param gene_id: a string with the Gene ID of the gene
+    @type gene_id: string
+    @param output_directory: directory the gene data is saved to
+    @type output_directory: string
+    @return: True if <gene_id>.txt exists in output_directory and is not empty, False otherwise
+    @rtype: bool
+    """
+
+    output_file_name = os.path.join(output_directory, gene_id + '.txt')
+    return os.path.isfile(output_file_name) and os.path.getsize(output_file_name) > 0
 
 if __name__ == '__main__':
 
@@ -56,8 +147,40 @@ if __name__ == '__main__':
     parser.add_argument('-l', '--gene_list', help='Gene ID or multiple gene_lists to retrieve from the Leiden Database.', nargs='*')
 
     parser.add_argument('-o', '--output_directory', default='.', help='Output directory for saved files.')
+    parser.add_argument('-j', '--jobs', type=int, default=DOWNLOAD_THREADS, help='Number of genes to download at once. '
+                                                                               'Lower this if the database limits '
+                                                                               'concurrent requests.')
+    parser.add_argument('-f', '--force_overwrite', default=False, action='store_true',
+                        help='Set to extract all genes with -a again, even if their files are already in the output '
+                             'directory. Otherwise an interrupted run resumes with the genes that are not saved yet.')
+    parser.add_argument('--cache', default=False, action='store_true', help='Set to cache downloaded pages in '
+                                                                            '~/.leiden_cache.sqlite for one day, so '
+                                                                            'repeated runs do not download them again '
+                                                                            '(requires requests_cache).')
+    parser.add_argument('--refresh_cache', default=False, action='store_true', help='Set with --cache to discard pages '
+                                                                                    'cached by previous runs (such as the '
+                                                                                    'list of available genes) and '
+                                                                                    'download them again.')
     args = parser.parse_args()
 
+    # Imported once arguments are valid, so --help and usage errors do not wait on loading requests and the HTML parsers
+    from leiden import leiden_database
+    from leiden import web_io
+
+    # Every page download thread of every gene needs its own pooled connection
+    web_io.set_connection_pool_size(max(1, args.jobs) * leiden_database.PAGE_DOWNLOAD_THREADS)
+
+    if args.cache:
+        cache_name = os.path.join(os.path.expanduser('~'), '.leiden_cache')
+
+        if web_io.enable_cache(cache_name, expire_after=CACHE_EXPIRE_AFTER):
+            print('Using pages cached in ' + cache_name + '.sqlite that are less than one day old')
+
+            if args.refresh_cache:
+                web_io.clear_cache()
+        else:
+            print('Not caching pages: the requests_cache package is not installed')
+
     # Make the output directory if does not already exist
     output_directory = args.output_directory
 
@@ -65,16 +188,30 @@ if __name__ == '__main__':
         os.mkdir(args.output_directory)
 
     genes = None
+    database = None
 
     if args.genes_available:
         # Print list of available genes to the user
-        print("\n".join(leiden_database._genes(args.leiden_url)))
+        print("\n".join(leiden_database.make_leiden_database(args.leiden_url).genes()))
 
     else:
         # User has specified the all option, extract data from all genes available on the Leiden Database
         if args.all:
             print("---> CHECKING AVAILABLE GENES...")
-            genes = leiden_database._genes(args.leiden_url)
+            database = leiden_database.make_leiden_database(args.leiden_url)
+            genes = database.genes()
+
+            # Skip genes saved by a previous run so an interrupted run can be resumed. Empty files are extracted again.
+            if not args.force_overwrite:
+                remaining_genes = []
+
+                for gene in genes:
+                    if is_saved(gene, output_directory):
+                        print('---> ' + gene + ': SKIP (already saved)')
+                    else:
+                        remaining_genes.append(gene)
+
+                genes = remaining_genes
 
         else:
             if len(args.gene_list) > 0:
@@ -83,23 +220,50 @@ if __name__ == '__main__':
                 print('Must specify at least one gene_list.')
 
         if genes:
-            print '---> Setting things up... '
-            database = leiden_database.make_leiden_database(args.leiden_url)
+            print('---> Setting things up... ')
+
+            # Reuse the database that listed the available genes if there is one
+            if database is None:
+                database = leiden_database.make_leiden_database(args.leiden_url)
+
+            print('---> Downloading data...')
+            pool = ThreadPool(max(1, args.jobs))
+            stop_downloads = threading.Event()
+            failed_genes = []
+
+            try:
+                # Extract table data and save to file, reporting each gene as soon as it is done
+                results = pool.imap_unordered(lambda gene: save_gene_data(database, gene, output_directory,
+                                                                          stop_downloads), genes)
 
-            for gene in genes:
-                print '---> ' + gene + ': IN PROGRESS...'
-                print '    ---> Downloading data...'
+                while True:
+                    try:
+                        gene, error = results.next(timeout=RESULT_POLL_INTERVAL)
+                    except TimeoutError:
+                        continue
+                    except StopIteration:
+                        break
 
-                # Extract table data and save to file
-                try:
-                    table_data, column_labels = extract_data(database, gene)
+                    if error is None:
+                        print('---> ' + gene + ': COMPLETE')
+                    else:
+                        print('---> ' + gene + ': ' + error)
+                        failed_genes.append(gene)
+            except KeyboardInterrupt:
+                # Genes not started yet are discarded, and genes being downloaded stop (without saving) once their
+                # current page arrives. Those threads are daemon threads and are not waited for. The shared session is
+                # left open for them and released when the process exits.
+                stop_downloads.set()
+                pool.terminate()
+                raise
 
-                    print '    ---> Saving raw data...'
-                    table_data.insert(0, column_labels)
-                    output_file_name = os.path.join(output_directory, gene + '.txt')
+            # All downloads are finished, release pooled connections
+            pool.close()
+            pool.join()
+            web_io.close_session()
 
-                    file_io.write_table_to_file(output_file_name, table_data)
-                except Exception as e:
-                    print '    ---> ' + str(e)
+            print('---> All genes complete.')
 
-            print '---> All genes complete.'
\ No newline at end of file
+            # A failed gene does not stop the others, list them so they can be retried with -l
+            if failed_genes:
+                print('---> Could not extract data for: ' + ' '.join(failed_genes))
\ No newline at end of file
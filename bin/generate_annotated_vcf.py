@@ -2,67 +2,186 @@
 #!/usr/bin/env python
 
 import argparse
+import multiprocessing
 import os
 import pandas as pd
 from leiden import annotate_vcf, vcf
-from leiden.remapping import VariantRemapper
 
 COLUMN_DELIMITER = '\t'
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Produce an annotated VCF from raw LOVD output files. Requires that a copy'
-                                                 'of variant_effect_predictor is on PATH with cache 27 and 28 installed and'
-                                                 'the Downstream plugin installed.')
+# Columns are normalized to the same labels for every gene, so the selection and layout are the same for all files
+COLUMN_LIST = ['dna_change', 'protein_change', 'var_pub_as', 'rna_change', 'db_id', 'variant_remarks', 'reference', 'frequency']
+VCF_COLUMN_ORDER = ['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']
 
-    group = parser.add_argument('-f', '--file_list',  help='File containing names of input raw LOVD output files to be annotated.')
+# Set in each remapping worker process by _start_remapping_worker
+_remapper = None
+_vcf_header_text = None
 
-    args = parser.parse_args()
 
-    with open(args.file_list, 'r') as f:
-        file_list = [x.split() for x in f.read()]
+def _start_remapping_worker(vcf_header_text):
+    """
+    Initializes a remapping worker process. Each worker loads its own reference data once and reuses it for every file.
+
+    Args:
+        vcf_header_text (str): header text written at the top of every VEP input file
+
+    """
+    global _remapper, _vcf_header_text
+
+    # Imported here so --help and usage errors do not wait on loading the hgvs and pygr libraries
+    from leiden.remapping import VariantRemapper
+
+    _remapper = VariantRemapper()
+    _vcf_header_text = vcf_header_text
+
+
+def prepare_annotation_input(file):
+    """
+    Remaps the variants in a raw LOVD output file and writes them to a VCF to be annotated by VEP. Runs in a remapping
+    worker process.
+
+    Args:
+        file (str): raw LOVD output file (as written by extract_data.py)
+
+    Returns:
+        tuple of str: VEP input file and final output VCF file for this LOVD file
+
+    """
+    base_file_name = os.path.splitext(file)[0]
+    annotation_input_file = base_file_name + '_HGVS.temp'
+    output_file = base_file_name + '.vcf'
+
+    # Clean LOVD data for VCF. Only the columns in COLUMN_LIST are parsed and cleaned, then put in COLUMN_LIST order.
+    lovd_file = pd.read_csv(file, sep=COLUMN_DELIMITER, usecols=COLUMN_LIST)
+    lovd_file = vcf.remove_malformed_fields(lovd_file)
+    lovd_data = lovd_file[COLUMN_LIST]
+
+    # Output VCF variants for annotation
+    vcf_format = vcf.convert_to_vcf_format(lovd_data, _remapper, 'dna_change', 'LOVD')
+
+    with open(annotation_input_file, 'w') as f:
+        f.write(_vcf_header_text)
 
-    rm = VariantRemapper()
+        vcf_format[VCF_COLUMN_ORDER].to_csv(f, sep=COLUMN_DELIMITER, header=False, index=False)
 
-    for file in file_list:
-        base_file_name = os.path.splitext(file)[0]
-        annotation_input_file = base_file_name + '_HGVS.temp'
-        output_file = base_file_name + '.vcf'
+    return annotation_input_file, output_file
 
-        # Clean LOVD data for VCF
-        lovd_file = pd.read_csv(file, sep=COLUMN_DELIMITER)
-        lovd_file = vcf.remove_malformed_fields(lovd_file)
 
-        # Output VCF variants for annotation
-        column_list = ['dna_change', 'protein_change', 'var_pub_as', 'rna_change', 'db_id', 'variant_remarks', 'reference', 'frequency']
+def _has_vep_and_lovd_tags(line):
+    """
+    Checks whether a variant line of VEP output has both VEP (CSQ) and LOVD tags in its INFO column.
 
+    Args:
+        line (str): variant line from a VCF file
 
-        vcf_format = vcf.convert_to_vcf_format(lovd_file[column_list], rm, 'dna_change', 'LOVD')
-        vcf_column_order = ['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']
+    Returns:
+        bool: True if the INFO column contains both tags, False otherwise (including blank lines and lines with no
+            INFO column)
 
-        with open(annotation_input_file, 'w') as f:
-            vcf_header = ['##fileformat=VCFv4.0',
-                          vcf.get_vcf_info_header(lovd_file[column_list], 'LOVD', 'Data from LOVD'),
-                          '#' + '\t'.join(vcf_column_order)
-            ]
-            f.write('\n'.join(vcf_header) + '\n')
+    """
+    columns = line.split(COLUMN_DELIMITER, 8)
 
-            vcf_format[vcf_column_order].to_csv(f, sep=COLUMN_DELIMITER, header=False, index=False)
+    if len(columns) <= 7:
+        return False
 
-        # Annotate with VEP
-        annotate_vcf.annotate_vep(annotation_input_file, output_file)
+    info = columns[7]
+    return 'CSQ' in info and 'LOVD' in info
 
-        # Combine VEP VCF output with original LOVD data
-        with open(output_file, 'r') as f:
-            header_lines = vcf.get_vcf_header_lines(f)
 
-        cumulative_vcf = pd.read_csv(output_file, header=len(header_lines)-1, sep=COLUMN_DELIMITER)
+def finish_annotation(vep_process, annotation_input_file, output_file):
+    """
+    Waits for VEP to finish annotating a file and produces the final VCF, which only contains variants that have
+    both VEP and LOVD annotations.
 
-        # Make sure only variants with both CSQ and LOVD tags are in INFO column (VEP can't annotate some)
-        cumulative_vcf = cumulative_vcf[cumulative_vcf['INFO'].str.contains('CSQ') & cumulative_vcf['INFO'].str.contains('LOVD')]
+    Args:
+        vep_process (subprocess.Popen): running VEP process, as returned by annotate_vcf.start_vep_annotation
+        annotation_input_file (str): VCF file given to VEP as input (removed once annotation is finished)
+        output_file (str): VCF file VEP is writing annotations to (overwritten with final VCF)
 
-        # Write final VCF
-        with open(output_file, 'w') as f:
-            f.writelines('\n'.join(header_lines) + '\n')
-            cumulative_vcf.to_csv(f, header=False, index=False, sep=COLUMN_DELIMITER)
+    Returns:
+        bool: True if the final VCF was written, False if VEP failed (the failure is reported and any partial output is
+            removed, so the file is annotated again on the next run)
+
+    """
+    return_code = vep_process.wait()
+
+    if return_code != 0:
+        print('Annotation failed for ' + output_file + ': VEP exited with status ' + str(return_code))
+
+        if os.path.isfile(output_file):
+            os.remove(output_file)
+        os.remove(annotation_input_file)
+        return False
+
+    # Make sure only variants with both CSQ and LOVD tags are in INFO column (VEP can't annotate some). Lines are
+    # filtered one at a time into a new file rather than loading the whole VEP output, which is then replaced.
+    filtered_output_file = output_file + '.temp'
+
+    with open(output_file, 'r') as vep_output, open(filtered_output_file, 'w', 1024 * 1024) as f:
+        f.writelines(line for line in vep_output if line.startswith(vcf.VCF_HEADER_PREFIX) or _has_vep_and_lovd_tags(line))
+
+    os.rename(filtered_output_file, output_file)
+    os.remove(annotation_input_file)
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Produce an annotated VCF from raw LOVD output files. Requires that a copy'
+                                                 'of variant_effect_predictor is on PATH with cache 27 and 28 installed and'
+                                                 'the Downstream plugin installed.')
+
+    group = parser.add_argument('-f', '--file_list', required=True, type=argparse.FileType('r'),
+                                help='File containing names of input raw LOVD output files to be annotated (one per line).')
+
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='Number of files to remap '
+                                                                                           'at once (one process each).')
+
+    args = parser.parse_args()
 
-        os.remove(annotation_input_file)
\ No newline at end of file
+    with args.file_list as f:
+        file_list = [x.strip() for x in f.read().splitlines() if x.strip()]
+
+    # Report missing files here rather than as errors from the remapping workers
+    missing_files = [file for file in file_list if not os.path.isfile(file)]
+    if missing_files:
+        print('Skipping files that do not exist: ' + ' '.join(missing_files))
+        file_list = [file for file in file_list if file not in missing_files]
+
+    # The header only depends on the column labels, which are the same for every file
+    vcf_header = ['##fileformat=VCFv4.0',
+                  vcf.get_vcf_info_header(pd.DataFrame(columns=COLUMN_LIST), 'LOVD', 'Data from LOVD'),
+                  '#' + '\t'.join(VCF_COLUMN_ORDER)
+    ]
+    vcf_header_text = '\n'.join(vcf_header) + '\n'
+
+    # Remapping is CPU-bound and independent for each file, so files are remapped in parallel worker processes. Results
+    # come back in order, and workers keep remapping later files while VEP annotates earlier ones.
+    pool = multiprocessing.Pool(max(1, args.jobs), initializer=_start_remapping_worker, initargs=(vcf_header_text,))
+    pending_annotation = None
+    failed_files = []
+
+    try:
+        for annotation_input_file, output_file in pool.imap(prepare_annotation_input, file_list):
+            # Annotate with VEP in the background. Only one VEP run at a time, it already uses several processes. The
+            # exit status of the previous run is checked by finish_annotation.
+            if pending_annotation is not None:
+                pending_annotation[0].wait()
+
+            next_annotation = (annotate_vcf.start_vep_annotation(annotation_input_file, output_file),
+                               annotation_input_file, output_file)
+
+            # Write the previous final VCF while VEP annotates this file
+            if pending_annotation is not None and not finish_annotation(*pending_annotation):
+                failed_files.append(pending_annotation[2])
+
+            pending_annotation = next_annotation
+
+        if pending_annotation is not None and not finish_annotation(*pending_annotation):
+            failed_files.append(pending_annotation[2])
+    finally:
+        # Stop any outstanding remapping (if interrupted)
+        pool.terminate()
+        pool.join()
+
+    if failed_files:
+        print('Annotation failed for: ' + ' '.join(failed_files))
\ No newline at end of file
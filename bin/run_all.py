@@ -9,61 +9,78 @@ import subprocess
 import argparse
 import glob
 import os
+import sys
 
-parser = argparse.ArgumentParser(description='Driver script for extracting an validating data from the Leiden Open '
-                                             'Variation Databases.')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Driver script for extracting an validating data from the Leiden Open '
+                                                 'Variation Databases.')
 
-group = parser.add_argument('-u', '--url', help='Input VCF file to be annotated.')
-group = parser.add_argument('--no_download', default=False, action='store_true', help='Set to use extracted data files '
-                                                                                     'rather than downloading new data.')
-group = parser.add_argument('-o', '--output_directory', default='.', help='Output directory for files. Search directory '
-                                                                          'for extracted data files if --use_files is '
-                                                                          'specified.')
-group = parser.add_argument('-f', '--force_overwrite', default=False, action='store_true', help='Overwrite existing annotation files.')
-args = parser.parse_args()
+    group = parser.add_argument('-u', '--url', help='Input VCF file to be annotated.')
+    group = parser.add_argument('--no_download', default=False, action='store_true', help='Set to use extracted data files '
+                                                                                         'rather than downloading new data.')
+    group = parser.add_argument('-o', '--output_directory', default='.', help='Output directory for files. Search directory '
+                                                                              'for extracted data files if --use_files is '
+                                                                              'specified.')
+    group = parser.add_argument('-f', '--force_overwrite', default=False, action='store_true',
+                                help='Overwrite existing annotation files and download data again for genes already '
+                                     'extracted to the output directory. Otherwise an interrupted run resumes where it '
+                                     'left off.')
+    args = parser.parse_args()
 
-output_directory = args.output_directory
+    output_directory = args.output_directory
 
-if not args.no_download:
-    # Download table data all genes at URL
-    pipe = subprocess.Popen(['python', 'extract_data.py', '-a',
-                             '-u', args.url,
-                             '-o', output_directory], stdout=subprocess.PIPE)
+    if not args.no_download:
+        # Download table data all genes at URL. Genes already extracted are skipped unless overwriting.
+        extract_data_command = ['python', 'extract_data.py', '-a',
+                                '-u', args.url,
+                                '-o', output_directory]
 
-    extract_data_log = pipe.communicate()[0]
+        if args.force_overwrite:
+            extract_data_command.append('-f')
 
-# Produce VCF files
-extracted_data_files = glob.glob(os.path.join(output_directory, '*.txt'))
+        pipe = subprocess.Popen(extract_data_command, stdout=subprocess.PIPE)
 
-files_to_annotate = []
-for file in extracted_data_files:
+        extract_data_log = pipe.communicate()[0]
 
-    vcf_file_path = os.path.splitext(file)[0] + '.vcf'
+    # Produce VCF files. Annotated files already present are listed once rather than checking for each data file.
+    extracted_data_files = glob.glob(os.path.join(output_directory, '*.txt'))
+    annotated_files = set(glob.glob(os.path.join(output_directory, '*.vcf')))
 
-    if os.path.exists(vcf_file_path) and not args.force_overwrite:
-        print 'Skipping', file, ': annotated file already in output directory. Use -f to overwrite.'
-    else:
-        files_to_annotate.append(file)
+    # The annotated file name of each data file is worked out once, for both the skip check and the validation list
+    files_to_annotate = []
+    annotated_files_list = []
+    for file in extracted_data_files:
 
-# Write temp list of files to annotate
-temp_file_name = 'files_to_annotate.temp'
-with open(temp_file_name, 'w') as f:
-    f.write('\n'.join(files_to_annotate))
+        vcf_file_path = os.path.splitext(file)[0] + '.vcf'
 
-pipe = subprocess.Popen(['python', 'generate_annotated_vcf.py', '-f', temp_file_name], stdin=subprocess.PIPE)
+        if vcf_file_path in annotated_files and not args.force_overwrite:
+            print 'Skipping', file, ': annotated file already in output directory. Use -f to overwrite.'
+        else:
+            files_to_annotate.append(file)
+            annotated_files_list.append(vcf_file_path)
 
-annotation_log = pipe.communicate()[0]
+    # Nothing left to annotate or validate, do not start the annotation and validation scripts
+    if not files_to_annotate:
+        print 'No files to annotate.'
+        sys.exit(0)
 
-annotated_files_list = [os.path.splitext(file)[0] + '.vcf' for files in files_to_annotate]
+    # Write temp list of files to annotate
+    temp_file_name = 'files_to_annotate.temp'
+    with open(temp_file_name, 'w') as f:
+        f.write('\n'.join(files_to_annotate))
 
-# Validate VCF Files
-with open('annotated_files.temp', 'w') as f:
-    f.write(' '.join(annotated_files_list))
+    pipe = subprocess.Popen(['python', 'generate_annotated_vcf.py', '-f', temp_file_name], stdin=subprocess.PIPE)
 
-pipe = subprocess.Popen(['python', 'validate_annotated_vcfs.py',
-                         '-f', 'annotated_files.temp',
-                         '-o', os.path.join(args.output_directory, 'lovd_validated_variants.vcf'),
-                         '-d', os.path.join(args.output_directory, 'lovd_discordant_variants.vcf'),
-                         ], stdout=subprocess.PIPE)
+    annotation_log = pipe.communicate()[0]
 
-validation_log = pipe.communicate()[0]
\ No newline at end of file
+    # Validate VCF Files
+    with open('annotated_files.temp', 'w') as f:
+        f.write('\n'.join(annotated_files_list))
+
+    pipe = subprocess.Popen(['python', 'validate_annotated_vcfs.py',
+                             '-f', 'annotated_files.temp',
+                             '-o', os.path.join(args.output_directory, 'lovd_validated_variants.vcf'),
+                             '-d', os.path.join(args.output_directory, 'lovd_discordant_variants.vcf'),
+                             ], stdout=subprocess.PIPE)
+
+    validation_log = pipe.communicate()[0]
\ No newline at end of file
@@ -1,6 +1,98 @@
 import argparse
+import multiprocessing
+import os
 from leiden import vcf, validation
 
+
+def get_info_tag_value(info, tag):
+    """
+    Returns the value of a tag in the INFO column of a VCF line. The tag is located with string searches rather than
+    splitting the whole INFO column, as only a couple of tags are needed from each line.
+
+    Args:
+        info (str): text from the INFO column of a VCF line
+        tag (str): ID of the INFO tag, such as CSQ
+
+    Returns:
+        str: value of the tag (text after tag= up to the next tag)
+
+    Raises:
+        KeyError: if tag is not in info
+
+    """
+    tag_start = tag + '='
+
+    # Only matches at the start of a tag count, not the same text at the end of another tag or inside a value
+    start = info.find(tag_start)
+    while start > 0 and info[start - 1] != ';':
+        start = info.find(tag_start, start + 1)
+
+    if start == -1:
+        raise KeyError(tag)
+
+    start += len(tag_start)
+    end = info.find(';', start)
+
+    return info[start:] if end == -1 else info[start:end]
+
+
+def validate_vcf_file(file):
+    """
+    Classifies each variant in an annotated VCF as concordant (the LOVD protein change matches the protein change VEP
+    predicts for at least one transcript) or discordant. Runs in a worker process, files are validated independently.
+
+    Args:
+        file (str): path to annotated VCF file, as produced by generate_annotated_vcf.py
+
+    Returns:
+        tuple: file, header lines of the VCF (list of str), concordant variant lines (list of str) and discordant variant
+            lines (list of str), in that order
+
+    """
+
+    concordant_lines = []
+    discordant_lines = []
+
+    with open(file, 'r') as f:
+        vcf_file = vcf.VCFReader(f)
+
+        # Only the LOVD protein change and the protein change VEP predicts for each transcript are compared, so each
+        # line is split once and only those fields are looked up, rather than parsing every field of every transcript.
+        protein_change_index = vcf_file.infos['LOVD']['format'].index('PROTEIN_CHANGE')
+        hgvsp_index = vcf_file.infos['CSQ']['format'].index('HGVSP')
+
+        for line in f:
+            columns = line.strip().split(vcf.VCF_DELIMITER)
+
+            # Blank or truncated lines have no INFO column to validate
+            if len(columns) < len(vcf_file.columns):
+                continue
+
+            # Always include variants that have a pubmed or omim reference
+            #if 'pubmed' in variant['INFO']['LOVD'][0]['REFERENCE'] or 'omim' in variant['INFO']['LOVD'][0]['REFERENCE']:
+            #    concordant_mutation_found = True
+            #    concordant_lines.append(str(variant) + '\n')
+
+            info = columns[7]
+            lovd_entry = get_info_tag_value(info, 'LOVD').split(',')[0]
+            lovd_protein_change = lovd_entry.split(vcf.FORMAT_DELIMITER)[protein_change_index]
+
+            # Check if any transcripts have matching protein change predictions (stops at the first match)
+            transcripts = get_info_tag_value(info, 'CSQ').split(',')
+            vep_protein_changes = (transcript.split(vcf.FORMAT_DELIMITER)[hgvsp_index] for transcript in transcripts)
+            concordant_mutation_found = validation.is_concordant_with_any(lovd_protein_change, vep_protein_changes)
+
+            # Same text VCFLine would produce for the VCF columns
+            variant_line = vcf.VCF_DELIMITER.join(columns[:len(vcf_file.columns)]) + '\n'
+
+            if concordant_mutation_found:
+                concordant_lines.append(variant_line)
+            else:
+                discordant_lines.append(variant_line)
+
+    return file, vcf_file.header_lines, concordant_lines, discordant_lines
+
+
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(description='Outputs a VCF with all validated variants from VCFs in file_list. '
@@ -8,78 +100,61 @@ if __name__ == '__main__':
                                                  'VCF file.')
 
     group = parser.add_argument_group()
-    group.add_argument('-f', '--file_names', required=True, help='File containing full paths to the VCF files to be processed.')
+    group.add_argument('-f', '--file_names', required=True, type=argparse.FileType('r'),
+                       help='File containing full paths to the VCF files to be processed (one per line).')
     group.add_argument('-o', '--output_file', default='lovd_validated_variants.vcf', help='Output file for validated variants (VCF).')
     group.add_argument('-d', '--discordant_output_file', default='lovd_discordant_variants.vcf', help='Output file for discordant variants (VCF).')
+    group.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='Number of files to validate at once (one process each).')
     args = parser.parse_args()
 
     total_mutation_count = 0
     total_concordant_mutation_count = 0
 
-    vcf_header = []
-    concordant_mutations = []
-    discordant_mutations = []
-
-    with open(args.file_names, 'r') as file_list:
-        files_to_process = file_list.read().splitlines()
-
-    for file in files_to_process:
-
-        gene_mutation_count = 0
-        gene_concordant_mutation_count = 0
+    with args.file_names as file_list:
+        files_to_process = [x.strip() for x in file_list.read().splitlines() if x.strip()]
 
-        with open(file, 'r') as f:
-            vcf_file = vcf.VCFReader(f)
+    # Files whose annotation failed are reported here rather than stopping validation of the others
+    missing_files = [file for file in files_to_process if not os.path.isfile(file)]
+    if missing_files:
+        print 'Skipping files that do not exist:', ' '.join(missing_files)
+        files_to_process = [file for file in files_to_process if file not in missing_files]
 
-            for variant in vcf_file:
-                total_mutation_count += 1
-                gene_mutation_count += 1
+    # Files are validated in parallel worker processes. Results come back in file order, so the output files are the
+    # same as validating one file at a time, and only the variants of files not yet written are held in memory.
+    pool = multiprocessing.Pool(max(1, args.jobs))
 
-                chromosome_number = variant['CHROM']
-                coordinate = variant['POS']
-                viewing_interval = 25
-                if coordinate != '.':
-                    ucsc_link = validation.get_ucsc_location_link(chromosome_number,
-                                                       str(int(coordinate) - viewing_interval),
-                                                       str(int(coordinate) + viewing_interval))
+    try:
+        with open(args.output_file, 'w') as concordant_file, open(args.discordant_output_file, 'w') as discordant_file:
+            header_written = False
 
-                concordant_mutation_found = False
+            for file, header_lines, concordant_lines, discordant_lines in pool.imap(validate_vcf_file, files_to_process):
 
-                # Always include variants that have a pubmed or omim reference
-                #if 'pubmed' in variant['INFO']['LOVD'][0]['REFERENCE'] or 'omim' in variant['INFO']['LOVD'][0]['REFERENCE']:
-                #    concordant_mutation_found = True
-                #    concordant_mutations.append(str(variant))
+                # Files are annotated the same way, so the header of the first file is used for both outputs
+                if not header_written:
+                    header_text = '\n'.join(header_lines) + '\n'
+                    concordant_file.write(header_text)
+                    discordant_file.write(header_text)
+                    header_written = True
 
-                lovd_protein_change = variant['INFO']['LOVD'][0]['PROTEIN_CHANGE']
+                concordant_file.writelines(concordant_lines)
+                discordant_file.writelines(discordant_lines)
 
-                # Check if any transcripts have matching protein change predictions
-                for transcript in variant['INFO']['CSQ']:
-                    vep_protein_change = transcript['HGVSP']
+                gene_concordant_mutation_count = len(concordant_lines)
+                gene_mutation_count = gene_concordant_mutation_count + len(discordant_lines)
 
-                    if (not concordant_mutation_found) and validation.is_concordant(lovd_protein_change, vep_protein_change):
-                        concordant_mutation_found = True
+                total_mutation_count += gene_mutation_count
+                total_concordant_mutation_count += gene_concordant_mutation_count
 
-                if concordant_mutation_found:
-                    total_concordant_mutation_count += 1
-                    gene_concordant_mutation_count += 1
-                    concordant_mutations.append(str(variant))
+                if gene_mutation_count > 0:
+                    print file, gene_concordant_mutation_count, '/', gene_mutation_count, 'Concordant'
                 else:
-                    discordant_mutations.append(str(variant))
-
-            if gene_mutation_count > 0:
-                print file, gene_concordant_mutation_count, '/', gene_mutation_count, 'Concordant'
-            else:
-                print file, ': No annotated variants - variants could not be remapped.'
+                    print file, ': No annotated variants - variants could not be remapped.'
+    finally:
+        # Stop any outstanding validation (if interrupted)
+        pool.terminate()
+        pool.join()
 
     print '-------------------------------------------'
     print total_concordant_mutation_count, '/', total_mutation_count, 'Concordant'
     print 'Concordant variants written to: ', args.discordant_output_file
-    print 'Discordant variants written to: ', args.output_file
-
-    with open(args.discordant_output_file, 'w') as discordant_file:
-        discordant_file.write('\n'.join(vcf_file.header_lines) + '\n')
-        discordant_file.write('\n'.join(discordant_mutations))
-
-    with open(args.output_file, 'w') as concordant_file:
-        concordant_file.write('\n'.join(vcf_file.header_lines) + '\n')
-        concordant_file.write('\n'.join(concordant_mutations))
\ No newline at end of file
+    print 'Discordant variants written to: ', args.output_file
\ No newline at end of file
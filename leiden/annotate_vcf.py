@@ -10,6 +10,23 @@ def annotate_vep(input_file, output_file):
         input_file (str): input VCF file path
         output_file (str): output VCF file path (VEP annotation added to file).
 
+    """
+    pipe = start_vep_annotation(input_file, output_file)
+    pipe.communicate()[0]
+
+
+def start_vep_annotation(input_file, output_file):
+    """
+    Start annotating VCF file with Variant Effect Predictor without waiting for annotation to finish, so other work can
+    be done while VEP runs.
+
+    Args:
+        input_file (str): input VCF file path
+        output_file (str): output VCF file path (VEP annotation added to file).
+
+    Returns:
+        subprocess.Popen: the running VEP process. Call wait on it before reading output_file.
+
     """
     # TODO - can use a config file to specify parameters, but have not gotten to work yet
     command = ['variant_effect_predictor.pl',
@@ -29,5 +46,4 @@ def annotate_vep(input_file, output_file):
 
     command = ' '.join(command)
 
-    pipe = subprocess.Popen(command, shell=True)
-    pipe.communicate()[0]
\ No newline at end of file
+    return subprocess.Popen(command, shell=True)
\ No newline at end of file
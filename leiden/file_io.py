@@ -1,3 +1,7 @@
+import csv
+import os
+
+
 def format_vcf_text(vcf_format_variants, info_column_entries):
     """
     Create formatted VCF file data from remapped variants.
@@ -11,6 +15,9 @@ def format_vcf_text(vcf_format_variants, info_column_entries):
     Returns:
         list of lists: list of lists where each inner list is a row of the VCF file, and each element in the inner list represents the value of the respective column in a given row.
 
+    Raises:
+        IndexError: if a tag has fewer values than there are variants
+
     """
     # Initialize with required header information for the VCF input to Variant Effect Predictor
     vcf_text = [
@@ -18,22 +25,32 @@ def format_vcf_text(vcf_format_variants, info_column_entries):
         ['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']
     ]
 
-    # Insert INFO tag descriptions into VCF header
+    # Insert INFO tag descriptions into VCF header. Lines are spliced in at once rather than inserting (and shifting the
+    # rest of the header) once per tag. Each tag was previously inserted at the top, so they are kept in reverse order.
     tag_keys = info_column_entries.keys()
 
-    for tag in tag_keys:
-        tag_header_text = ''.join(['##INFO=<ID=', tag, ',Number=1,Type=', info_column_entries[tag][0], ',Description="', info_column_entries[tag][1], '">'])
-        vcf_text.insert(1, [tag_header_text])
+    tag_header_lines = [[''.join(['##INFO=<ID=', tag, ',Number=1,Type=', info_column_entries[tag][0], ',Description="', info_column_entries[tag][1], '">'])]
+                        for tag in tag_keys]
+    vcf_text[1:1] = tag_header_lines[::-1]
+
+    # Format VCF body text. The values of every tag are walked alongside the variants rather than indexed per variant.
+    tag_values = [info_column_entries[tag][2] for tag in tag_keys]
+
+    # zip stops at the shortest list, which would silently drop variants
+    for tag, values in zip(tag_keys, tag_values):
+        if len(values) < len(vcf_format_variants):
+            raise IndexError('INFO tag %s has %d values for %d variants' % (tag, len(values), len(vcf_format_variants)))
+
+    # Without any tags, every variant still gets a row (with an empty INFO column)
+    tag_values_by_variant = zip(*tag_values) if tag_values else [()] * len(vcf_format_variants)
 
-    # Format VCF body text
-    for i in range(0, len(vcf_format_variants)):
+    for variant, variant_tag_values in zip(vcf_format_variants, tag_values_by_variant):
 
-        chromosome_number, coordinate, ref, alt = vcf_format_variants[i]
+        chromosome_number, coordinate, ref, alt = variant
 
         tag_list = []
-        for tag in tag_keys:
-            tag_value = info_column_entries[tag][2][i].replace(' ', '')
-            tag_list.append(tag + '=' + tag_value)
+        for tag, tag_value in zip(tag_keys, variant_tag_values):
+            tag_list.append(tag + '=' + tag_value.replace(' ', ''))
 
         vcf_file_row = [chromosome_number,
                         coordinate,
@@ -62,10 +79,11 @@ def read_table_from_file(file_name, column_delimiter='\t'):
 
     """
 
+    # The C-based csv reader splits lines as it reads them, rather than reading the whole file and then splitting it.
+    # Quotes have no special meaning in these files, so quoting is disabled. Blank lines are kept as a row with a single
+    # empty column, as they would be by splitting the line on the delimiter.
     with open(file_name, 'r') as f:
-        file_text = f.read().splitlines()
-
-    return [line.split(column_delimiter) for line in file_text]
+        return [row if row else [''] for row in csv.reader(f, delimiter=str(column_delimiter), quoting=csv.QUOTE_NONE)]
 
 
 def write_table_to_file(file_name, table, column_delimiter='\t'):
@@ -75,22 +93,31 @@ def write_table_to_file(file_name, table, column_delimiter='\t'):
     Args:
         file_name (str): name of output file with extension (can include path)
         column_delimiter (str): column delimiter (tab by default)
-        table (list of lists): table data to output to file. 1st dimension is rows, 2nd is columns.
+        table (list of lists): table data to output to file. 1st dimension is rows, 2nd is columns. Any iterable of rows
+            is accepted, rows are written as they are produced. The file is only created (or replaced) once every row
+            has been written.
 
     """
 
     row_delimiter = '\n'
 
-    file_lines = []
-
-    for row in table:
-        file_lines.append(column_delimiter.join(row))
-
-    output_text = row_delimiter.join(file_lines)
-
-    # Ensure unicode strings are encoded before writing
-    if isinstance(output_text, unicode):
-        output_text = output_text.encode('utf-8')
-
-    with open(file_name, 'w') as f:
-        f.write(output_text)
\ No newline at end of file
+    # Rows are formatted as they are written rather than building the entire file in memory. The join method is looked
+    # up once rather than for every row.
+    join = column_delimiter.join
+    lines = (join(row) + row_delimiter for row in table)
+
+    # Rows are written to a temporary file that replaces file_name once complete, so an interrupted or failed write
+    # (table rows are often still being downloaded) never leaves a partial file_name behind.
+    temp_file_name = file_name + '.temp'
+    written = False
+
+    try:
+        with open(temp_file_name, 'wb', 1024 * 1024) as f:
+            # Ensure text is encoded before writing
+            f.writelines(line if isinstance(line, bytes) else line.encode('utf-8') for line in lines)
+
+        os.rename(temp_file_name, file_name)
+        written = True
+    finally:
+        if not written and os.path.exists(temp_file_name):
+            os.remove(temp_file_name)
\ No newline at end of file
@@ -1,9 +1,35 @@
 import re
 import math
 
-from bs4 import BeautifulSoup
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from bs4 import BeautifulSoup, SoupStrainer
 from . import web_io, utilities
 
+# Use the C-based lxml parser when it is installed, it is much faster than the pure python parser on large tables
+try:
+    import lxml
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
+# Characters replaced with underscores when normalizing column labels
+_NON_ALPHANUMERIC_REGEX = re.compile('[^A-Za-z0-9]')
+
+# Whitespace characters in table cells, applied to every cell of every variant table
+_WHITESPACE_REGEX = re.compile(r'\s')
+
+# LOVD version number in the footer of every LOVD page, and the number of entries in a gene's table of variants
+_LOVD_VERSION_REGEX = re.compile(r'LOVD v\.([23])\.\d', re.IGNORECASE)
+_ENTRY_COUNT_REGEX = re.compile(r'(\d+)\s(?:entries|entry)')
+
+# Number of pages of a gene's table of variants downloaded ahead of the page being read. Genes are often downloaded
+# concurrently as well, size the connection pool for the total with web_io.set_connection_pool_size.
+PAGE_DOWNLOAD_THREADS = 2
+
+# LOVD version numbers already detected, keyed by base URL
+_lovd_version_numbers = {}
+
 
 def make_leiden_database(leiden_url):
     """
@@ -42,7 +68,8 @@ def make_leiden_database(leiden_url):
 
 def _extract_lovd_version_number(leiden_url):
     """
-    Extract the version number of the lovd installation at the specified URL.
+    Extract the version number of the lovd installation at the specified URL. The homepage is only downloaded the first
+    time a given URL is checked.
 
     Args:
         leiden_url (str): the base URL of the particular Leiden lovd to be used.
@@ -54,17 +81,19 @@ def _extract_lovd_version_number(leiden_url):
 
     """
 
+    if leiden_url in _lovd_version_numbers:
+        return _lovd_version_numbers[leiden_url]
+
     html = web_io.get_page_html(leiden_url)
 
     # Extract the version number from HTML
-    try:
-        regex = re.compile('LOVD v\.([23])\.\d', re.IGNORECASE)
-        results = regex.search(html)
-        version_number = results.group(1)
-    except Exception as e:
+    results = _LOVD_VERSION_REGEX.search(html)
+
+    if results is None:
         raise ValueError('No version number detected at specified URL')
 
-    return float(version_number)
+    _lovd_version_numbers[leiden_url] = float(results.group(1))
+    return _lovd_version_numbers[leiden_url]
 
 
 class LeidenDatabase:
@@ -78,6 +107,9 @@ class LeidenDatabase:
 
     """
 
+    # Lists of available genes already downloaded, keyed by base URL
+    _available_genes_cache = {}
+
     def __init__(self, leiden_url):
         """
         Initializes a LeidenDatabase object for the specified Leiden Database URL and gene.
@@ -125,6 +157,30 @@ class LeidenDatabase:
         """
         raise NotImplementedError('Abstract method')
 
+    def _cached_genes(self):
+        """
+        Returns a list of gene IDs available on this database. The list is only downloaded the first time it is requested
+        for this database's URL and is shared by all LeidenDatabase objects for the same URL.
+
+        Returns:
+            list of str: list of gene IDs available on this database.
+
+        """
+        if self._leiden_url not in LeidenDatabase._available_genes_cache:
+            LeidenDatabase._available_genes_cache[self._leiden_url] = self._genes()
+
+        return LeidenDatabase._available_genes_cache[self._leiden_url]
+
+    @staticmethod
+    def clear_caches():
+        """
+        Clears cached LOVD version numbers and lists of available genes, so they are downloaded again the next time they
+        are needed. Only needed by long-running processes that must pick up changes to a database.
+
+        """
+        _lovd_version_numbers.clear()
+        LeidenDatabase._available_genes_cache.clear()
+
     def get_gene_data(self, gene_id):
         """
         Returns a _GeneData object that provides a interface to data on the specified gene. Available functions allow
@@ -153,15 +209,15 @@ class _LOVD2Database(LeidenDatabase):
         # Call to the super class constructor
         LeidenDatabase.__init__(self, leiden_url)
         self._version_number = 2
-        self._available_genes = self._genes()
+        self._available_genes = self._cached_genes()
 
     def _genes(self):
         # Construct URL of page containing the drop-down to select various genes
         start_url = "".join([self._leiden_url, '?action=switch_db'])
 
-        # Download and parse HTML from base URL
+        # Download and parse HTML from base URL, only the drop-down is needed
         html = web_io.get_page_html(start_url)
-        url_soup = BeautifulSoup(html)
+        url_soup = BeautifulSoup(html, _HTML_PARSER, parse_only=SoupStrainer(id='SelectGeneDB'))
 
         # Extract all options from the SelectGeneDB drop-down control
         options = url_soup.find(id='SelectGeneDB').find_all('option')
@@ -191,15 +247,15 @@ class _LOVD3Database(LeidenDatabase):
         # Call to the super class constructor
         LeidenDatabase.__init__(self, leiden_url)
         self._version_number = 3
-        self._available_genes = self._genes()
+        self._available_genes = self._cached_genes()
 
     def _genes(self):
         # Construct URL of page containing the drop-down to select various genes
         start_url = "".join([self._leiden_url, 'genes/', '?page_size=1000&page=1'])
 
-        # Download and parse HTML from base URL
+        # Download and parse HTML from base URL, only table rows are needed
         html = web_io.get_page_html(start_url)
-        url_soup = BeautifulSoup(html)
+        url_soup = BeautifulSoup(html, _HTML_PARSER, parse_only=SoupStrainer('tr'))
 
         # Extract all gene entries from the lovd homepage
         table_class = 'data'
@@ -241,12 +297,21 @@ class GeneData:
         self._leiden_home_url = leiden_url
         self._gene_id = gene_id
 
+        # URLs are fixed for a given gene, construct them once
+        self._variant_database_url = self._get_variant_database_url()
+        self._gene_homepage_url = self._get_gene_homepage_url()
+
         # Extract HTML and create BeautifulSoup objects for gene_id pages
         html = self._get_variant_database_html()
-        self._database_soup = BeautifulSoup(html)
+        self._database_soup = BeautifulSoup(html, _HTML_PARSER)
 
+        # Only links are searched on the gene homepage
         html = self._get_gene_homepage_html()
-        self._gene_homepage_soup = BeautifulSoup(html)
+        self._gene_homepage_soup = BeautifulSoup(html, _HTML_PARSER, parse_only=SoupStrainer('a'))
+
+        # Column labels and transcript are parsed on first request
+        self._columns = None
+        self._transcript_refseqid = None
 
     def _get_variant_database_url(self):
         """
@@ -267,8 +332,7 @@ class GeneData:
             str: html from the table of variant entries for this gene.
 
         """
-        url = self._get_variant_database_url()
-        return web_io.get_page_html(url)
+        return web_io.get_page_html(self._variant_database_url)
 
     def _get_gene_homepage_url(self):
         """
@@ -289,8 +353,7 @@ class GeneData:
             str: html from the homepage for this gene.
 
         """
-        url = self._get_gene_homepage_url()
-        return web_io.get_page_html(url)
+        return web_io.get_page_html(self._gene_homepage_url)
 
     def _get_link_urls(self, link_result_set):
         """
@@ -311,13 +374,14 @@ class GeneData:
         transcript_id = self.transcript_refseqid()
         for links in link_result_set:
             link_url = links.get('href')
+            link_text = links.string
 
             # Process HGVS notation
-            if links.string and ('c.' in links.string or 'p.' in links.string):
-                hgvs_notation = utilities.remove_times_reported(links.string)
+            if link_text and ('c.' in link_text or 'p.' in link_text):
+                hgvs_notation = utilities.remove_times_reported(link_text)
                 hgvs_notation = utilities.correct_hgvs_parentheses(hgvs_notation)
-                result.append("".join([transcript_id, ':', hgvs_notation]))
-            elif links.string:
+                result.append(transcript_id + ':' + hgvs_notation)
+            elif link_text:
                 result.append(link_url)
 
         return link_delimiter.join(result)
@@ -336,7 +400,7 @@ class GeneData:
 
         """
         label = label.lower().strip()
-        label = re.sub(re.compile('[^A-Za-z0-9]'), '_', label)
+        label = _NON_ALPHANUMERIC_REGEX.sub('_', label)
 
         # Some databases do not have consistent headers
         if 'protein' in label:
@@ -358,6 +422,18 @@ class GeneData:
 
         """
 
+        # Needed for every HGVS link in the table of variants, only search the homepage once
+        if self._transcript_refseqid is None:
+            self._transcript_refseqid = self._parse_transcript_refseqid()
+
+        return self._transcript_refseqid
+
+    def _parse_transcript_refseqid(self):
+        """
+        Helper function to find the transcript refSeq ID on the gene homepage. See transcript_refseqid for return value.
+
+        """
+
         # Find all links on the gene homepage
         entries = self._gene_homepage_soup.find_all('a')
         for tags in entries:
@@ -376,6 +452,17 @@ class GeneData:
 
         """
 
+        if self._columns is None:
+            self._columns = self._parse_columns()
+
+        return self._columns
+
+    def _parse_columns(self):
+        """
+        Helper function to extract and normalize the column labels from the table of variants. See columns for return value.
+
+        """
+
         raise NotImplementedError('Abstract method')
 
     def variants(self):
@@ -388,18 +475,59 @@ class GeneData:
 
         """
 
+        return list(self.iter_variants())
+
+    def iter_variants(self):
+        """
+        Generates the rows of the table of variants for gene. Rows can be processed (such as written to file) while
+        later pages are fetched: at most PAGE_DOWNLOAD_THREADS pages are downloaded ahead of the page being read, and
+        the next page is only requested once a page has been handed over. At most PAGE_DOWNLOAD_THREADS + 1 pages are
+        held in memory at a time.
+
+        Returns:
+            generator of list of str: rows of the table of variants from the gene
+
+        """
+
         total_variant_count = self.variant_count()
 
         # Calculate the number of pages website will use to present data
         variants_per_page = 1000  # max allowed value
         total_pages = int(math.ceil(float(total_variant_count)/float(variants_per_page)))
 
-        # Get table data from all pages
-        table_data = []
-        for page_number in range(1, total_pages + 1):
-            table_data.extend(self._variants_page_n(page_number))
+        page_numbers = iter(range(1, total_pages + 1))
+
+        if total_pages <= 1:
+            for page_number in page_numbers:
+                for row in self._variants_page_n(page_number):
+                    yield row
+            return
+
+        # Download later pages in the background while earlier pages are read, pages are still returned in order. Only
+        # a fixed number of pages are requested ahead, so a large gene is not held in memory all at once.
+        pool = ThreadPool(PAGE_DOWNLOAD_THREADS)
+        pending_pages = deque()
+
+        try:
+            for page_number in page_numbers:
+                pending_pages.append(pool.apply_async(self._variants_page_n, (page_number,)))
+                if len(pending_pages) == PAGE_DOWNLOAD_THREADS:
+                    break
 
-        return table_data
+            while pending_pages:
+                page = pending_pages.popleft().get()
+
+                # Replace the page handed over with the next one
+                next_page_number = next(page_numbers, None)
+                if next_page_number is not None:
+                    pending_pages.append(pool.apply_async(self._variants_page_n, (next_page_number,)))
+
+                for row in page:
+                    yield row
+        finally:
+            # Stop any outstanding downloads if not all rows were read
+            pool.terminate()
+            pool.join()
 
     def _variants_page_n(self, page_number):
         """
@@ -431,8 +559,7 @@ class GeneData:
         """
 
         # Search for sequences of digits that are four digits or longer in length.
-        m = re.compile('(\d+)\s(?:entries|entry)')
-        results = m.search(self._database_soup.get_text())
+        results = _ENTRY_COUNT_REGEX.search(self._database_soup.get_text())
 
         # Return entire matched sequence (PMID)
         if results is not None:
@@ -461,7 +588,7 @@ class _LOVD2GeneData(GeneData):
 
         return "".join([self._leiden_home_url, 'home.php?select_db=', self._gene_id])
 
-    def columns(self):
+    def _parse_columns(self):
 
         # Find all th tags on the table of variants (column labels)
         headers = self._database_soup.find_all('th')
@@ -481,18 +608,19 @@ class _LOVD2GeneData(GeneData):
     def _variants_page_n(self, page_number):
 
         # TODO this is somewhat redundant w/ other subclass
-        if page_number is not 1:
+        # id specific to data table in HTML (must be unicode due to underscore)
+        table_id = "".join([u'table', u'\u005F', u'data'])
 
-            page_url = self._get_variant_database_url() + '&page=' + str(page_number)
+        if page_number != 1:
 
+            page_url = self._variant_database_url + '&page=' + str(page_number)
+
+            # Only the data table is needed from additional pages, skip building the rest of the page
             html = web_io.get_page_html(page_url)
-            database_soup = BeautifulSoup(html)
+            database_soup = BeautifulSoup(html, _HTML_PARSER, parse_only=SoupStrainer(id=table_id))
         else:
             database_soup = self._database_soup
 
-        # id specific to data table in HTML (must be unicode due to underscore)
-        table_id = "".join([u'table', u'\u005F', u'data'])
-
         # Extract the HTML specific to the table data
         table = database_soup.find_all(id=table_id)[0].find_all('tr')
 
@@ -504,14 +632,15 @@ class _LOVD2GeneData(GeneData):
         for rows in table:
             entries = []
             for columns in rows.find_all('td'):
-                # If there are any links in the cell, process them with get_link_info
-                if columns.find('a') is not None:
-                    link_string = self._get_link_urls(columns.find_all('a'))
-                    link_string = re.sub(r'\s', '', link_string)  # ensure there is no whitespace
+                # If there are any links in the cell, process them with get_link_info (one search finds and collects them)
+                links = columns.find_all('a')
+                if links:
+                    link_string = self._get_link_urls(links)
+                    link_string = _WHITESPACE_REGEX.sub('', link_string)  # ensure there is no whitespace
                     entries.append(link_string)
                 else:
                     column_string = columns.string.strip()  # ensure there is no whitespace
-                    column_string = re.sub(r'\s', ' ', column_string)
+                    column_string = _WHITESPACE_REGEX.sub(' ', column_string)
                     entries.append(column_string)
             row_entries.append(entries)
         return row_entries
@@ -536,7 +665,7 @@ class _LOVD3GeneData(GeneData):
 
         return "".join([self._leiden_home_url, 'genes/', self._gene_id, '?page_size=1000&page=1'])
 
-    def columns(self):
+    def _parse_columns(self):
 
         # Find all th tags on the table of variants (column labels)
         headers = self._database_soup.find_all('th')
@@ -555,12 +684,13 @@ class _LOVD3GeneData(GeneData):
     def _variants_page_n(self, page_number):
 
         # TODO this is somewhat redundant w/ other subclass
-        if page_number is not 1:
+        if page_number != 1:
 
-            page_url = self._get_variant_database_url() + '&page=' + str(page_number)
+            page_url = self._variant_database_url + '&page=' + str(page_number)
 
+            # Only table rows are needed from additional pages, skip building the rest of the page
             html = web_io.get_page_html(page_url)
-            database_soup = BeautifulSoup(html)
+            database_soup = BeautifulSoup(html, _HTML_PARSER, parse_only=SoupStrainer('tr'))
         else:
             database_soup = self._database_soup
 
@@ -585,14 +715,15 @@ class _LOVD3GeneData(GeneData):
             # all contain images, while none of the data rows do. This allows column label row to be filtered out.
             entries = []
             for columns in rows.find_all('td'):
-                # If there are any links in the cell, process them with get_link_info
-                if columns.find('a') is not None:
-                    link_string = self._get_link_urls(columns.find_all('a'))
-                    link_string = re.sub(r'\s', '', link_string)  # ensure there is no whitespace
+                # If there are any links in the cell, process them with get_link_info (one search finds and collects them)
+                links = columns.find_all('a')
+                if links:
+                    link_string = self._get_link_urls(links)
+                    link_string = _WHITESPACE_REGEX.sub('', link_string)  # ensure there is no whitespace
                     entries.append(link_string)
                 else:
                     column_string = columns.string.strip()
-                    column_string = re.sub(r'\s', ' ', column_string)  # ensure there is no non-space whitespace
+                    column_string = _WHITESPACE_REGEX.sub(' ', column_string)  # ensure there is no non-space whitespace
                     entries.append(column_string)
             row_entries.append(entries)
         return row_entries
\ No newline at end of file
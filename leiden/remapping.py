@@ -1,10 +1,17 @@
 import os
-import re
 
 import hgvs
 import hgvs.utils
 from pygr.seqdb import SequenceFileDB
 
+# Chromosome names returned by the hgvs library are prefixed with chr
+_CHROMOSOME_NAME_PREFIX = 'chr'
+
+# Errors raised for variants that can not be remapped: malformed HGVS names (hgvs.InvalidHGVSName is a ValueError),
+# unknown transcripts, HGVS kinds and mutation types the hgvs library does not support, inconsistent coordinates, and
+# coordinates missing from the reference
+_REMAPPING_ERRORS = (ValueError, NotImplementedError, AssertionError, KeyError, IndexError, AttributeError)
+
 
 class VariantRemapper:
     """
@@ -50,11 +57,41 @@ class VariantRemapper:
         hgvs_variant = str(hgvs_variant)
 
         chromosome_number, coordinate, ref, alt = hgvs.parse_hgvs_name(hgvs_variant, self.genome, get_transcript=self._get_transcript)
-        chromosome_number = re.match('chr(.+)', chromosome_number).group(1)
+
+        # Fixed prefix, strip it by slicing rather than matching a regular expression for every variant
+        if not chromosome_number.startswith(_CHROMOSOME_NAME_PREFIX) or len(chromosome_number) == len(_CHROMOSOME_NAME_PREFIX):
+            raise ValueError('Unexpected chromosome name: ' + chromosome_number)
+
+        chromosome_number = chromosome_number[len(_CHROMOSOME_NAME_PREFIX):]
         coordinate = str(coordinate)
 
         return chromosome_number, coordinate, ref, alt
 
+    def hgvs_to_vcf_batch(self, hgvs_variants):
+        """
+        Converts a collection of variants provided in HGVS notation to genomic coordinate notation. Each distinct variant
+        is only remapped once, no matter how many times it appears in hgvs_variants.
+
+        Args:
+            hgvs_variants (list of str): HGVS descriptions of variants. See hgvs_to_vcf for accepted formats.
+
+        Returns:
+            dict: dictionary where keys are the distinct variants in hgvs_variants and values are tuples of str
+                (chromosome_number, coordinate, ref, alt) as returned by hgvs_to_vcf. Variants that could not be
+                remapped have a value of None.
+
+        """
+
+        results = {}
+        for hgvs_variant in hgvs_variants:
+            if hgvs_variant not in results:
+                try:
+                    results[hgvs_variant] = self.hgvs_to_vcf(hgvs_variant)
+                except _REMAPPING_ERRORS:
+                    results[hgvs_variant] = None
+
+        return results
+
     def vcf_to_hgvs(self, reference_transcript, vcf_notation):
         """
         Converts a single VCF notation variant to HGVS notation relative to a given transcript.
@@ -1,4 +1,5 @@
 from nose.tools import assert_equals
+from nose.tools import with_setup
 from . import leiden_database
 from mock import Mock
 import web_io
@@ -14,6 +15,13 @@ def mock_html_response(database, gene_homepage_response, variant_database_respon
     return database
 
 
+def clear_caches():
+    """
+    Helper function to clear the module level caches, so tests do not depend on the URLs used by earlier tests
+    """
+    leiden_database.LeidenDatabase.clear_caches()
+
+
 def test_extract_lovd_version_number_with_lovd_2():
     input = 'http://www.dmd.nl/nmdb2/'
     result = 2.0
@@ -28,15 +36,44 @@ def test_extract_lovd_version_number_with_lovd_3():
     assert_equals(result, leiden_database._extract_lovd_version_number(input))
 
 
+@with_setup(clear_caches, clear_caches)
+def test_extract_lovd_version_number_is_cached():
+    input = 'http://databases.lovd.nl/whole_genome/'
+    web_io.get_page_html = Mock(return_value=responses.GEDI_HOMEPAGE_HTML)
+    leiden_database._extract_lovd_version_number(input)
+    leiden_database._extract_lovd_version_number(input)
+    assert_equals(web_io.get_page_html.call_count, 1)
+
+
+@with_setup(clear_caches, clear_caches)
+def test_available_genes_are_cached():
+    input = 'http://www.example.org/nmdb2/'
+    web_io.get_page_html = Mock(return_value=responses.NMDB2_HOMEPAGE_HTML)
+    first_database = leiden_database._LOVD2Database(input)
+    second_database = leiden_database._LOVD2Database(input)
+    assert_equals(web_io.get_page_html.call_count, 1)
+    assert_equals(first_database.genes(), second_database.genes())
+
+    # Cleared caches should download the list again
+    leiden_database.LeidenDatabase.clear_caches()
+    leiden_database._LOVD2Database(input)
+    assert_equals(web_io.get_page_html.call_count, 2)
+
+
 class TestLOVD2DatabaseACTA1():
 
     @classmethod
     def setup_class(cls):
+        clear_caches()
         web_io.get_page_html = Mock(return_value=responses.NMDB2_HOMEPAGE_HTML)
         leiden_database._LOVD2GeneData = mock_html_response(leiden_database._LOVD2GeneData, responses.ACTA1_GENE_HOMEPAGE_HTML, responses.ACTA1_VARIANT_DATABASE_HTML)
         cls.database = leiden_database._LOVD2Database('http://www.dmd.nl/nmdb2/')
         cls.gene = cls.database.get_gene_data('ACTA1')
 
+    @classmethod
+    def teardown_class(cls):
+        clear_caches()
+
     def test_get_lovd_version(cls):
         # Static method, not overridden in subclasses
         pass
@@ -72,11 +109,16 @@ class TestLOVD2DatabaseCAPN3():
 
     @classmethod
     def setup_class(cls):
+        clear_caches()
         web_io.get_page_html = Mock(return_value=responses.NMDB2_HOMEPAGE_HTML)
         leiden_database._LOVD2GeneData = mock_html_response(leiden_database._LOVD2GeneData, responses.CAPN3_GENE_HOMEPAGE_HTML, responses.CAPN3_VARIANT_DATABASE_HTML)
         cls.database = leiden_database._LOVD2Database('http://www.dmd.nl/nmdb2/')
         cls.gene = cls.database.get_gene_data('CAPN3')
 
+    @classmethod
+    def teardown_class(cls):
+        clear_caches()
+
     def test_get_lovd_version(cls):
         # Static method, not overridden in subclasses
         pass
@@ -116,11 +158,16 @@ class TestLOVD3DatabaseBBS1():
 
     @classmethod
     def setup_class(cls):
+        clear_caches()
         web_io.get_page_html = Mock(return_value=responses.GEDI_HOMEPAGE_HTML)
         leiden_database._LOVD3GeneData = mock_html_response(leiden_database._LOVD3GeneData, responses.BBS1_GENE_HOMEPAGE_HTML, responses.BBS1_VARIANT_DATABASE_HTML)
         cls.database = leiden_database._LOVD3Database('http://mseqdr.lumc.edu/GEDI/')
         cls.gene = cls.database.get_gene_data('BBS1')
 
+    @classmethod
+    def teardown_class(cls):
+        clear_caches()
+
     def test_get_version_number_with_bbs1(cls):
         result = 3
         assert_equals(cls.database.version_number(), result)
@@ -154,11 +201,16 @@ class TestLOVD3DatabaseCTC1():
 
     @classmethod
     def setup_class(cls):
+        clear_caches()
         web_io.get_page_html = Mock(return_value=responses.GEDI_HOMEPAGE_HTML)
         leiden_database._LOVD3GeneData = mock_html_response(leiden_database._LOVD3GeneData, responses.CTC1_GENE_HOMEPAGE_HTML, responses.CTC1_VARIANT_DATABASE_HTML)
         cls.database = leiden_database._LOVD3Database('http://mseqdr.lumc.edu/GEDI/')
         cls.gene = cls.database.get_gene_data('CTC1')
 
+    @classmethod
+    def teardown_class(cls):
+        clear_caches()
+
     def test_get_version_number(cls):
         result = 3
         assert_equals(cls.database.version_number(), result)
@@ -0,0 +1,47 @@
+from nose.tools import assert_equals
+from nose.tools import assert_raises
+from mock import Mock
+from . import remapping
+
+
+class MockRemapper(remapping.VariantRemapper):
+    """
+    VariantRemapper with hgvs_to_vcf mocked, so no reference genome or transcripts are needed
+    """
+    def __init__(self, side_effect):
+        self.hgvs_to_vcf = Mock(side_effect=side_effect)
+
+
+def mock_hgvs_to_vcf(hgvs_variant):
+    """
+    Helper function to stand in for hgvs_to_vcf, variants containing 'bad' can not be remapped
+    """
+    if 'bad' in hgvs_variant:
+        raise ValueError('transcript is required')
+    return '1', str(len(hgvs_variant)), 'A', 'G'
+
+
+def test_hgvs_to_vcf_batch():
+    remapper = MockRemapper(mock_hgvs_to_vcf)
+    input = ['NM_1:c.1A>G', 'NM_1:c.10A>G', 'NM_1:c.1A>G']
+    result = {'NM_1:c.1A>G': ('1', '11', 'A', 'G'), 'NM_1:c.10A>G': ('1', '12', 'A', 'G')}
+    assert_equals(remapper.hgvs_to_vcf_batch(input), result)
+
+
+def test_hgvs_to_vcf_batch_remaps_duplicates_once():
+    remapper = MockRemapper(mock_hgvs_to_vcf)
+    input = ['NM_1:c.1A>G', 'NM_1:c.1A>G', 'bad', 'NM_1:c.1A>G', 'bad']
+    remapper.hgvs_to_vcf_batch(input)
+    assert_equals(remapper.hgvs_to_vcf.call_count, 2)
+
+
+def test_hgvs_to_vcf_batch_with_failures():
+    # Variants that can not be remapped are None, the others are unaffected
+    remapper = MockRemapper(mock_hgvs_to_vcf)
+    input = ['bad', 'NM_1:c.1A>G', 'bad:c.1A>G']
+    result = {'bad': None, 'NM_1:c.1A>G': ('1', '11', 'A', 'G'), 'bad:c.1A>G': None}
+    assert_equals(remapper.hgvs_to_vcf_batch(input), result)
+
+    # Errors other than remapping failures are not hidden
+    remapper = MockRemapper(TypeError('unexpected'))
+    assert_raises(TypeError, remapper.hgvs_to_vcf_batch, ['NM_1:c.1A>G'])
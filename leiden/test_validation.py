@@ -1,4 +1,5 @@
 from nose.tools import assert_equals, assert_true, assert_false
+from mock import patch
 from . import validation
 
 
@@ -61,12 +62,43 @@ def test_is_concordant_with_transcript_id():
     assert_true(validation.is_concordant(protein_change_1, protein_change_2))
 
 
+#######################################################################################################################
+# Tests for is_concordant_with_any
+#######################################################################################################################
+def test_is_concordant_with_any():
+    protein_changes = ['Arg892Tyr', 'NP_32562.3:ARG890TYR', 'Arg890Lys']
+
+    assert_true(validation.is_concordant_with_any('p.(Arg890Tyr)', protein_changes))
+
+
+def test_is_concordant_with_any_with_no_match():
+    protein_changes = ['Arg892Tyr', 'Arg890Lys']
+
+    assert_false(validation.is_concordant_with_any('Arg890Tyr', protein_changes))
+
+
+def test_is_concordant_with_any_with_empty_protein_change():
+    protein_changes = ['', 'Arg890Tyr']
+
+    assert_false(validation.is_concordant_with_any('', protein_changes))
+
+
 #######################################################################################################################
 # Tests for normalize_protein_notation
 #######################################################################################################################
 
 # Indirectly tested by is_concordant tests
 
+
+def test_normalize_protein_notation_cache_is_bounded():
+    with patch.object(validation, '_MAX_NORMALIZED_PROTEIN_NOTATIONS', 5):
+        for i in range(12):
+            validation.normalize_protein_notation('p.Arg%dTer' % i)
+
+        assert_true(len(validation._normalized_protein_notations) <= 5)
+        assert_equals(validation.normalize_protein_notation('p.Arg3Ter'), 'arg3*')
+
+
 #######################################################################################################################
 # Tests for get_ucsc_location_link
 #######################################################################################################################
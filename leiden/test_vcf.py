@@ -1,24 +1,56 @@
+import os
+import tempfile
+from StringIO import StringIO
+import pandas as pd
 from . import vcf
 from nose.tools import assert_equals
+from mock import Mock
 
 vcf_lines = ['##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence type as predicted by VEP. Format: Allele|Gene|Feature|Feature_type|Consequence|cDNA_position|CDS_position|Protein_position|Amino_acids|Codons|Existing_variation|AA_MAF|EA_MAF|EXON|INTRON|MOTIF_NAME|MOTIF_POS|HIGH_INF_POS|MOTIF_SCORE_CHANGE|DISTANCE|STRAND|CLIN_SIG|CANONICAL|SYMBOL|SYMBOL_SOURCE|SIFT|PolyPhen|GMAF|BIOTYPE|ENSP|DOMAINS|CCDS|HGVSc|HGVSp|AFR_MAF|AMR_MAF|ASN_MAF|EUR_MAF|PUBMED">',
              '##INFO=<ID=LOVD,Number=.,Type=String,Description="Consequence type as predicted by VEP. Format: DNA_CHANGE|PROTEIN_CHANGE">',
-             vcf.VCF_DELIMTER.join(['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']),
-             vcf.VCF_DELIMTER.join(['1', '229569803', 'NM_001100.3:c.-66_-65delinsTC', 'AG', 'GA', '.', '.', 'LOVD=NM_001100.3:c.-66_-65delinsTC|p.Arg352Tyr;CSQ=GA|ENSESTG00000008577|ENSESTT00000021605|Transcript|5_prime_UTR_variant|38-39|||||ACTA1:c.-66_-65delinsTC|||1/7|||||||-1||||||||protein_coding|ENSESTP00000021605|||ENSESTT00000021605.1:c.-66_-65delCTinsTC||||||,GA|ENSESTG00000008577|ENSESTT00000021571|Transcript|5_prime_UTR_variant|40-41|||||ACTA1:c.-66_-65delinsTC|||1/4|||||||-1||||||||protein_coding|ENSESTP00000021571|||ENSESTT00000021571.1:c.-66_-65delCTinsTC||||||']),
+             vcf.VCF_DELIMITER.join(['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']),
+             vcf.VCF_DELIMITER.join(['1', '229569803', 'NM_001100.3:c.-66_-65delinsTC', 'AG', 'GA', '.', '.', 'LOVD=NM_001100.3:c.-66_-65delinsTC|p.Arg352Tyr;CSQ=GA|ENSESTG00000008577|ENSESTT00000021605|Transcript|5_prime_UTR_variant|38-39|||||ACTA1:c.-66_-65delinsTC|||1/7|||||||-1||||||||protein_coding|ENSESTP00000021605|||ENSESTT00000021605.1:c.-66_-65delCTinsTC||||||,GA|ENSESTG00000008577|ENSESTT00000021571|Transcript|5_prime_UTR_variant|40-41|||||ACTA1:c.-66_-65delinsTC|||1/4|||||||-1||||||||protein_coding|ENSESTP00000021571|||ENSESTT00000021571.1:c.-66_-65delCTinsTC||||||']),
              ]
 
 
-def test_get_vcf_dict():
+def read_first_vcf_line(lines):
+    """
+    Helper function to parse the first variant line following the header in lines
+    """
+    return vcf.VCFReader(StringIO('\n'.join(lines) + '\n')).next()
 
-    result = [{'CHROM': '1', 'POS': '229569803', 'ID': 'NM_001100.3:c.-66_-65delinsTC', 'REF': 'AG', 'ALT': 'GA', 'QUAL': '.', 'FILTER': '.',
+
+def test_get_vcf_header_lines():
+    # The file is left at the first variant line, so it is the next line read after the header
+    vcf_text = '\n'.join(vcf_lines) + '\n'
+    file_descriptor, file_name = tempfile.mkstemp(suffix='.vcf')
+
+    try:
+        with os.fdopen(file_descriptor, 'w') as f:
+            f.write(vcf_text)
+
+        with open(file_name, 'r') as f:
+            assert_equals(vcf_lines[:3], vcf.get_vcf_header_lines(f))
+            assert_equals(vcf_lines[3] + '\n', f.readline())
+
+        with open(file_name, 'r') as f:
+            vcf_reader = vcf.VCFReader(f)
+            assert_equals('229569803', vcf_reader.next()['POS'])
+    finally:
+        os.remove(file_name)
+
+
+def test_vcf_reader_next():
+
+    result = {'CHROM': '1', 'POS': '229569803', 'ID': 'NM_001100.3:c.-66_-65delinsTC', 'REF': 'AG', 'ALT': 'GA', 'QUAL': '.', 'FILTER': '.',
               'INFO': {
-                  'LOVD': {
+                  'LOVD': [{
                         'DNA_CHANGE': 'NM_001100.3:c.-66_-65delinsTC',
                         'PROTEIN_CHANGE': 'p.Arg352Tyr'
-                  },
+                  }],
 
-                  'CSQ': {
-                    'ENSESTT00000021605': {
+                  'CSQ': [
+                    {
                         'AA_MAF': '',
                         'AFR_MAF': '',
                         'ALLELE': 'GA',
@@ -59,7 +91,7 @@ def test_get_vcf_dict():
                         'SYMBOL': '',
                         'SYMBOL_SOURCE': ''},
 
-                      'ENSESTT00000021571': {
+                      {
                           'AA_MAF': '',
                           'AFR_MAF': '',
                           'ALLELE': 'GA',
@@ -99,47 +131,98 @@ def test_get_vcf_dict():
                           'STRAND': '-1',
                           'SYMBOL': '',
                           'SYMBOL_SOURCE': ''},
-                  }
-              }}]
+                  ]
+              }}
 
-    assert_equals(result, vcf.get_vcf_dict(vcf_lines))
+    variant = read_first_vcf_line(vcf_lines)
+    assert_equals(result, dict((column, variant[column]) for column in result))
 
 
-def test_get_info_formats():
+def test_parse_vcf_header_formats():
     input = vcf_lines
     result = {'LOVD': ['DNA_CHANGE', 'PROTEIN_CHANGE'], 'CSQ': ['ALLELE', 'GENE', 'FEATURE', 'FEATURE_TYPE', 'CONSEQUENCE', 'CDNA_POSITION', 'CDS_POSITION', 'PROTEIN_POSITION', 'AMINO_ACIDS', 'CODONS', 'EXISTING_VARIATION', 'AA_MAF', 'EA_MAF', 'EXON', 'INTRON', 'MOTIF_NAME', 'MOTIF_POS', 'HIGH_INF_POS', 'MOTIF_SCORE_CHANGE', 'DISTANCE', 'STRAND', 'CLIN_SIG', 'CANONICAL', 'SYMBOL', 'SYMBOL_SOURCE', 'SIFT', 'POLYPHEN', 'GMAF', 'BIOTYPE', 'ENSP', 'DOMAINS', 'CCDS', 'HGVSC', 'HGVSP', 'AFR_MAF', 'AMR_MAF', 'ASN_MAF', 'EUR_MAF', 'PUBMED']}
 
-    assert_equals(result, vcf._get_info_formats(input))
+    infos = vcf.VCFReader.parse_vcf_header(input)
+    assert_equals(result, dict((tag, infos[tag]['format']) for tag in infos))
 
 
-def test_get_id_string():
+def test_parse_vcf_header_id():
     input = '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence type as predicted by VEP. Format: Allele|Gene|Feature|Feature_type|Consequence|cDNA_position|CDS_position|Protein_position|Amino_acids|Codons|Existing_variation|AA_MAF|EA_MAF|EXON|INTRON|MOTIF_NAME|MOTIF_POS|HIGH_INF_POS|MOTIF_SCORE_CHANGE|DISTANCE|STRAND|CLIN_SIG|CANONICAL|SYMBOL|SYMBOL_SOURCE|SIFT|PolyPhen|GMAF|BIOTYPE|ENSP|DOMAINS|CCDS|HGVSc|HGVSp|AFR_MAF|AMR_MAF|ASN_MAF|EUR_MAF|PUBMED">'
     result = 'CSQ'
 
-    assert_equals(result, vcf._get_id_string(input))
+    assert_equals([result], vcf.VCFReader.parse_vcf_header([input]).keys())
 
 
-def test_get_format_string():
+def test_parse_vcf_header_description():
     input = '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence type as predicted by VEP. Format: Allele|Gene|Feature|Feature_type|Consequence|cDNA_position|CDS_position|Protein_position|Amino_acids|Codons|Existing_variation|AA_MAF|EA_MAF|EXON|INTRON|MOTIF_NAME|MOTIF_POS|HIGH_INF_POS|MOTIF_SCORE_CHANGE|DISTANCE|STRAND|CLIN_SIG|CANONICAL|SYMBOL|SYMBOL_SOURCE|SIFT|PolyPhen|GMAF|BIOTYPE|ENSP|DOMAINS|CCDS|HGVSc|HGVSp|AFR_MAF|AMR_MAF|ASN_MAF|EUR_MAF|PUBMED">'
-    result = 'Allele|Gene|Feature|Feature_type|Consequence|cDNA_position|CDS_position|Protein_position|Amino_acids|Codons|Existing_variation|AA_MAF|EA_MAF|EXON|INTRON|MOTIF_NAME|MOTIF_POS|HIGH_INF_POS|MOTIF_SCORE_CHANGE|DISTANCE|STRAND|CLIN_SIG|CANONICAL|SYMBOL|SYMBOL_SOURCE|SIFT|PolyPhen|GMAF|BIOTYPE|ENSP|DOMAINS|CCDS|HGVSc|HGVSp|AFR_MAF|AMR_MAF|ASN_MAF|EUR_MAF|PUBMED'
+    result = 'Consequence type as predicted by VEP. Format: Allele|Gene|Feature|Feature_type|Consequence|cDNA_position|CDS_position|Protein_position|Amino_acids|Codons|Existing_variation|AA_MAF|EA_MAF|EXON|INTRON|MOTIF_NAME|MOTIF_POS|HIGH_INF_POS|MOTIF_SCORE_CHANGE|DISTANCE|STRAND|CLIN_SIG|CANONICAL|SYMBOL|SYMBOL_SOURCE|SIFT|PolyPhen|GMAF|BIOTYPE|ENSP|DOMAINS|CCDS|HGVSc|HGVSp|AFR_MAF|AMR_MAF|ASN_MAF|EUR_MAF|PUBMED'
 
-    assert_equals(result, vcf._get_format_string(input))
+    assert_equals(result, vcf.VCFReader.parse_vcf_header([input])['CSQ']['description'])
 
 
 def test_normalize_format_string():
     input = 'Allele|gene|Feature-type'
     result = 'ALLELE|GENE|FEATURE_TYPE'
 
-    assert_equals(result, vcf._normalize_format_string(input))
+    assert_equals(result, vcf.VCFReader._normalize_format_string(input))
 
 
 def test_get_info_column_dict():
-    raise NotImplementedError('Test not implemented')
+    # Tags without a format are kept as text, values may contain '='
+    header_lines = vcf_lines[:2] + ['##INFO=<ID=NOTE,Number=1,Type=String,Description="Free text">'] + vcf_lines[2:3]
+    vcf_reader = vcf.VCFReader(StringIO('\n'.join(header_lines) + '\n'))
+    input = 'NOTE=a=b;LOVD=c.1A>G|p.Arg1Tyr'
+    result = {'NOTE': 'a=b', 'LOVD': [{'DNA_CHANGE': 'c.1A>G', 'PROTEIN_CHANGE': 'p.Arg1Tyr'}]}
+
+    assert_equals(result, vcf_reader._get_info_dict(input))
 
 
 def test_get_csq_dict():
-    raise NotImplementedError('Test not implemented')
+    # One entry per transcript, in order, with fields named by the header format
+    variant = read_first_vcf_line(vcf_lines)
+    transcripts = variant['INFO']['CSQ']
+
+    assert_equals(['ENSESTT00000021605', 'ENSESTT00000021571'], [transcript['FEATURE'] for transcript in transcripts])
+    assert_equals(vcf.VCFReader.parse_vcf_header(vcf_lines)['CSQ']['format'], transcripts[0].keys())
 
 
 def test_get_lovd_dict():
-    raise NotImplementedError('Test not implemented')
\ No newline at end of file
+    variant = read_first_vcf_line(vcf_lines)
+    result = [{'DNA_CHANGE': 'NM_001100.3:c.-66_-65delinsTC', 'PROTEIN_CHANGE': 'p.Arg352Tyr'}]
+
+    assert_equals(result, variant['INFO']['LOVD'])
+
+
+def test_convert_to_vcf_format():
+    input = pd.DataFrame([['c.1A>G', 'p.Arg1Tyr'], ['c.2A>G', ''], ['c.1A>G', 'p.Arg3Tyr']],
+                         columns=['dna_change', 'protein_change'])
+    remapper = Mock()
+    remapper.hgvs_to_vcf_batch = Mock(return_value={'c.1A>G': ('1', '100', 'A', 'G'), 'c.2A>G': ('X', '5', 'C', 'T')})
+
+    vcf_format = vcf.convert_to_vcf_format(input, remapper, 'dna_change', 'LOVD')
+
+    assert_equals(list(vcf_format['CHROM']), ['1', 'X', '1'])
+    assert_equals(list(vcf_format['POS']), ['100', '5', '100'])
+    assert_equals(list(vcf_format['ID']), ['c.1A>G', 'c.2A>G', 'c.1A>G'])
+    assert_equals(list(vcf_format['REF']), ['A', 'C', 'A'])
+    assert_equals(list(vcf_format['ALT']), ['G', 'T', 'G'])
+    assert_equals(list(vcf_format['INFO']), ['LOVD=c.1A>G|p.Arg1Tyr', 'LOVD=c.2A>G|', 'LOVD=c.1A>G|p.Arg3Tyr'])
+
+
+def test_convert_to_vcf_format_with_failed_remapping():
+    # Rows whose variant could not be remapped have '.' for every VCF field, and rows stay in input order
+    input = pd.DataFrame([['c.2A>G', 'p.Arg2Tyr'], ['c.bad', 'p.Arg1Tyr'], ['c.1A>G', 'p.Arg3Tyr']],
+                         columns=['dna_change', 'protein_change'], index=[5, 3, 4])
+    remapper = Mock()
+    remapper.hgvs_to_vcf_batch = Mock(return_value={'c.1A>G': ('1', '100', 'A', 'G'), 'c.2A>G': ('1', '50', 'C', 'T'),
+                                                     'c.bad': None})
+
+    vcf_format = vcf.convert_to_vcf_format(input, remapper, 'dna_change', 'LOVD')
+
+    assert_equals(list(vcf_format.index), [5, 3, 4])
+    assert_equals(list(vcf_format['CHROM']), ['1', '.', '1'])
+    assert_equals(list(vcf_format['POS']), ['50', '.', '100'])
+    assert_equals(list(vcf_format['ID']), ['c.2A>G', '.', 'c.1A>G'])
+    assert_equals(list(vcf_format['REF']), ['C', '.', 'A'])
+    assert_equals(list(vcf_format['ALT']), ['T', '.', 'G'])
+    assert_equals(list(vcf_format['INFO']), ['LOVD=c.2A>G|p.Arg2Tyr', 'LOVD=c.bad|p.Arg1Tyr', 'LOVD=c.1A>G|p.Arg3Tyr'])
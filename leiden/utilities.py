@@ -1,5 +1,15 @@
 import re
 
+# Matches (Reported N times) annotations along with any surrounding whitespace
+_TIMES_REPORTED_REGEX = re.compile(r'\s*\(Reported \d+ Times\)\s*', re.IGNORECASE)
+
+# PUBMED IDs are four digits or longer, OMIM IDs are a gene ID and entry number separated by a hash mark
+_PMID_REGEX = re.compile(r'\d{4,}')
+_OMIMID_REGEX = re.compile(r'\d+#\d+')
+
+# Variant description wrapped in parentheses, brackets and/or whitespace after the c. or p. prefix
+_HGVS_PARENTHESES_REGEX = re.compile(r'([pc]\.)[\s\(\[]+(.+)[\s\)\]]+(?:$|\s)', re.IGNORECASE)
+
 
 def correct_hgvs_parentheses(hgvs_notation):
     """
@@ -13,8 +23,7 @@ def correct_hgvs_parentheses(hgvs_notation):
         str: hgvs_notation with no parenthesis or whitespace surrounding the variant description.
 
     """
-    search_pattern = re.compile('([pc]\.)[\s\(\[]+(.+)[\s\)\]]+(?:$|\s)', re.IGNORECASE)
-    match = re.search(search_pattern, hgvs_notation)
+    match = _HGVS_PARENTHESES_REGEX.search(hgvs_notation)
 
     if match:
         return match.group(1) + match.group(2)
@@ -40,8 +49,7 @@ def get_pmid(link_url):
     """
 
     # Search for sequences of digits that are four digits or longer in length.
-    m = re.compile('\d{4,}')
-    results = m.search(link_url)
+    results = _PMID_REGEX.search(link_url)
 
     # Return entire matched sequence (PMID)
     if results is not None:
@@ -70,8 +78,7 @@ def get_omimid(link_url):
     """
 
     # Search for sequences of digits separated only by a hash mark
-    m = re.compile('\d+#\d+')
-    results = m.search(link_url)
+    results = _OMIMID_REGEX.search(link_url)
 
     # Return entire matched sequence (OMIM ID)
     if results is not None:
@@ -92,11 +99,8 @@ def remove_times_reported(hgvs_notation):
             Whitespace surrounding this substring is removed in returned string.
 
     """
-    # Compile case-insensitive regex to match pattern
-    m = re.compile('\s*\(Reported \d+ Times\)\s*', re.IGNORECASE)
-
     # Replace pattern in original string with empty string
-    return m.sub('', hgvs_notation)
+    return _TIMES_REPORTED_REGEX.sub('', hgvs_notation)
 
 
 def find_string_index(string_list, search_string):
@@ -116,17 +120,10 @@ def find_string_index(string_list, search_string):
     """
 
     # Remove leading/trailing whitespace and convert to lowercase before comparisons
-    string_list = [x.lower().strip() for x in string_list]
     search_string = search_string.lower().strip()
 
-    for i in range(0, len(string_list)):
-        entry = string_list[i]
-
-        if search_string in entry:
-            return i
-
-    # search_string not found, return -1
-    return -1
+    # Returns -1 if search_string is not found
+    return next((i for i, entry in enumerate(string_list) if search_string in entry.lower().strip()), -1)
 
 
 def swap(list, i, j):
@@ -160,10 +157,4 @@ def deep_copy(nested_list):
         list: deep copy of nested_list
 
     """
-    copy = []
-    for item in nested_list:
-        if isinstance(item, list):
-            copy.append(deep_copy(item))
-        else:
-            copy.append(item)
-    return copy
+    return [deep_copy(item) if isinstance(item, list) else item for item in nested_list]
@@ -1,5 +1,17 @@
 import re
 
+# Common stop codon notations, all normalized to '*'. Xaa must come before X so it is replaced as a whole.
+_STOP_CODON_REGEX = re.compile('xaa|x|ter')
+
+# Protein change with p. notation and optional surrounding parentheses or brackets, such as p.(Arg890Tyr)
+_P_DOT_REGEX = re.compile(r'[p]\.[\(\[]?([^\)\]]+)[\)\]]?', re.IGNORECASE)
+
+# Protein notations already normalized, keyed by original notation. The same LOVD notation is compared against every
+# VEP transcript of a variant, and the same variant is often reported many times. The cache is emptied once it holds
+# _MAX_NORMALIZED_PROTEIN_NOTATIONS entries, so memory stays bounded however many files are validated.
+_normalized_protein_notations = {}
+_MAX_NORMALIZED_PROTEIN_NOTATIONS = 100000
+
 
 def is_concordant(protein_change_1, protein_change_2):
     """
@@ -25,6 +37,34 @@ def is_concordant(protein_change_1, protein_change_2):
     return protein_change_1 == protein_change_2
 
 
+def is_concordant_with_any(protein_change, protein_changes):
+    """
+    Determines whether a protein change value is equivalent to any of several others, such as the protein change
+    predicted for each transcript of a variant. Equivalent to calling is_concordant on each pair, but protein_change is
+    only normalized once and comparison stops at the first equivalent value.
+
+    Args:
+        protein_change (str): HGVS protein change notation
+        protein_changes (iterable of str): HGVS protein change notations to compare protein_change with
+
+    Returns:
+        bool: True if protein_change is equivalent to at least one of protein_changes; False otherwise (always False if
+            protein_change is an empty string).
+
+    """
+
+    protein_change = normalize_protein_notation(protein_change)
+
+    if protein_change == '':
+        return False
+
+    for other_protein_change in protein_changes:
+        if normalize_protein_notation(other_protein_change) == protein_change:
+            return True
+
+    return False
+
+
 def normalize_protein_notation(protein_change_notation):
     """
     Tries to convert protein notations to a uniform format for equality comparison. Converts to lower-case, removes
@@ -37,16 +77,23 @@ def normalize_protein_notation(protein_change_notation):
         str: protein change notation normalized to uniform format.
 
     """
-    if ':' in protein_change_notation:
-        protein_change_notation = protein_change_notation.split(':')[1]
+    if protein_change_notation in _normalized_protein_notations:
+        return _normalized_protein_notations[protein_change_notation]
+
+    normalized_notation = protein_change_notation
+
+    if ':' in normalized_notation:
+        normalized_notation = normalized_notation.split(':')[1]
+
+    normalized_notation = normalized_notation.lower()
+    normalized_notation = _STOP_CODON_REGEX.sub('*', normalized_notation)
+    normalized_notation = remove_p_dot_notation(normalized_notation)
 
-    protein_change_notation = protein_change_notation.lower()
-    protein_change_notation = re.sub('xaa', '*', protein_change_notation)
-    protein_change_notation = re.sub('x', '*', protein_change_notation)
-    protein_change_notation = re.sub('ter', '*', protein_change_notation)
-    protein_change_notation = remove_p_dot_notation(protein_change_notation)
+    if len(_normalized_protein_notations) >= _MAX_NORMALIZED_PROTEIN_NOTATIONS:
+        _normalized_protein_notations.clear()
 
-    return protein_change_notation
+    _normalized_protein_notations[protein_change_notation] = normalized_notation
+    return normalized_notation
 
 
 def get_ucsc_location_link(chromosome_number, start_coordinate, end_coordinate):
@@ -82,8 +129,7 @@ def remove_p_dot_notation(annotation_text):
 
     """
 
-    search_pattern = re.compile('[p]\.[\(\[]?([^\)\]]+)[\)\]]?', re.IGNORECASE)
-    match = re.search(search_pattern, annotation_text)
+    match = _P_DOT_REGEX.search(annotation_text)
 
     if match:
         return match.group(1)
@@ -6,23 +6,41 @@ VCF_HEADER_PREFIX = '#'
 VCF_DELIMITER = '\t'
 FORMAT_DELIMITER = '|'
 
+# Fields of an INFO header line, which the VCF specification requires to appear in this order. VEP-like descriptions end
+# with the format of their nested entries (Format: A|B|C), captured in the same pass as the description itself.
+_INFO_HEADER_REGEX = re.compile('ID=([^,]+),Number=([^,]+),Type=([^,]+),Description="(.*?(?:Format: (.+))?)"',
+                                re.IGNORECASE)
+
+# Characters replaced with underscores when normalizing tag format strings
+_FORMAT_STRING_REGEX = re.compile('[^A-Za-z|]')
+
 
 def get_vcf_header_lines(vcf_file):
     """
-    Return a list with the header lines from a VCF file.
+    Return a list with the header lines from a VCF file. The file is left at the start of the first variant line.
 
     Args:
-        vcf_file: path to VCF file
+        vcf_file (file object): pre-opened VCF file, positioned at the start of the header
 
     Returns:
         list of str: list of header lines from VCF file
 
     """
 
-    def stop_loop():
-        raise StopIteration
+    header_lines = []
+
+    # Header lines are identified by their first character rather than searching each line. Lines are read one at a
+    # time so the file can be returned to the start of the first variant line, which is not part of the header.
+    position = vcf_file.tell()
+    line = vcf_file.readline()
 
-    return list(x.strip("\n") if x.startswith(VCF_HEADER_PREFIX) else stop_loop() for x in vcf_file)
+    while line.startswith(VCF_HEADER_PREFIX):
+        header_lines.append(line.strip("\n"))
+        position = vcf_file.tell()
+        line = vcf_file.readline()
+
+    vcf_file.seek(position)
+    return header_lines
 
 
 class VCFReader():
@@ -79,15 +97,11 @@ class VCFReader():
         """
         infos = {}
         for line in vcf_header_lines:
-            if '##INFO' in line:
-                id = re.search('ID=([^,]+)\,', line, re.IGNORECASE).group(1)
-                number = re.search('Number=([^,]+),', line, re.IGNORECASE).group(1)
-                data_type = re.search('Type=([^,]+),', line, re.IGNORECASE).group(1)
-                description = re.search('Description="(.+)"', line, re.IGNORECASE).group(1)
+            if line.startswith('##INFO'):
+                id, number, data_type, description, tag_format = _INFO_HEADER_REGEX.search(line).groups()
                 infos[id] = {'number': number, 'type': data_type, 'description': description}
 
-                if 'format' in description.lower():
-                    tag_format = re.search('Format: (.+)', description, re.IGNORECASE).group(1)
+                if tag_format is not None:
                     tag_format = VCFReader._normalize_format_string(tag_format)
                     infos[id]['format'] = tag_format.split(FORMAT_DELIMITER)
 
@@ -106,8 +120,7 @@ class VCFReader():
 
         """
         format_string = format_string.upper()
-        pattern = re.compile('[^A-Za-z|]')
-        return re.sub(pattern, '_', format_string)
+        return _FORMAT_STRING_REGEX.sub('_', format_string)
 
     def __iter__(self):
         """
@@ -149,15 +162,15 @@ class VCFReader():
             dict: dict containing parsed data from info_text.
 
         """
-        tags = [x.split('=') for x in info_text.split(';')]
-        info_dict = ordereddict(tags)
-
-        for tag in info_dict:
-            if 'format' in self.infos[tag]:
-                result = []
-                for entry in info_dict[tag].split(','):
-                    result.append(ordereddict(zip(self.infos[tag]['format'], entry.split(FORMAT_DELIMITER))))
-                info_dict[tag] = result
+        # Values may contain '=' themselves, only the first one separates the tag from its value
+        info_dict = ordereddict([x.split('=', 1) for x in info_text.split(';')])
+
+        # Header information for each tag is looked up once, and VEP-like values are split into entries in one pass
+        for tag, value in info_dict.items():
+            tag_format = self.infos[tag].get('format')
+
+            if tag_format is not None:
+                info_dict[tag] = [ordereddict(zip(tag_format, entry.split(FORMAT_DELIMITER))) for entry in value.split(',')]
         return info_dict
 
 
@@ -262,25 +275,6 @@ def get_vcf_info_header(data_frame, tag_id, description):
     return '##INFO=<ID=' + tag_id + ',Number=.,TYPE=String,Description="' + description + ' Format: ' + format_string + '">'
 
 
-def _map_to_genomic_coordinates(hgvs_variant, remapper):
-    """
-    Helper function to use with pandas.DataFrame.apply. Converts HGVS entries to VCF format.
-
-    Args:
-        hgvs_variant (str): HGVS formatted variant
-        remapper (leiden.remapping.VariantRemapper): VariantRemapper (accepted as parameter because creation is expensive)
-
-    Returns:
-        pandas.DataSeries: VCF representation of variant
-
-    """
-    try:
-        chrom, pos, ref, alt = remapper.hgvs_to_vcf(hgvs_variant)
-        return pd.Series({'CHROM': chrom, 'POS': pos, 'ID': hgvs_variant, 'REF': ref, 'ALT': alt})
-    except Exception as e:
-        return pd.Series({'CHROM': '.', 'POS': '.', 'ID': '.', 'REF': '.', 'ALT': '.'})
-
-
 def convert_to_vcf_format(data_frame, remapper, hgvs_column, info_tag):
     """
     Converts a pandas dataframe that contains HGVS variants along with other data about the variants to a VCF representation.
@@ -300,12 +294,30 @@ def convert_to_vcf_format(data_frame, remapper, hgvs_column, info_tag):
 
     data_frame = _convert_to_vcf_friendly_text(data_frame)
 
-    vcf_format = data_frame[hgvs_column].apply(_map_to_genomic_coordinates, args=[remapper])
-    info = info_tag + '=' + data_frame.apply(lambda row: FORMAT_DELIMITER.join(map(str, row)), axis=1)
+    # Remap each distinct variant once, as the same variant is often reported many times
+    remapped_variants = remapper.hgvs_to_vcf_batch(data_frame[hgvs_column].unique())
+
+    # Look up the coordinates of every row at once by reindexing the remapped variants with the HGVS column. Variants
+    # that could not be remapped are left out, so their rows are missing values and become '.' like the other fields.
+    hgvs_variants = data_frame[hgvs_column]
+    remapped_items = [item for item in remapped_variants.items() if item[1] is not None]
+    remapped = pd.DataFrame([remapped_variant for hgvs_variant, remapped_variant in remapped_items],
+                            columns=['CHROM', 'POS', 'REF', 'ALT'],
+                            index=[hgvs_variant for hgvs_variant, remapped_variant in remapped_items])
+
+    vcf_format = remapped.reindex(hgvs_variants.values)
+    vcf_format.index = data_frame.index
+    vcf_format.insert(2, 'ID', hgvs_variants.where(vcf_format['CHROM'].notnull()))
+    vcf_format = vcf_format.fillna('.')
+
+    # Join whole columns at a time rather than applying a function to every row
+    info = info_tag + '=' + data_frame[data_frame.columns[0]].astype(str)
+    for column in data_frame.columns[1:]:
+        info = info + FORMAT_DELIMITER + data_frame[column].astype(str)
+
     vcf_format['INFO'] = info
     vcf_format['FILTER'] = '.'
     vcf_format['QUAL'] = '.'
 
-    vcf_format.sort(['CHROM', 'POS'])
     return vcf_format
 
@@ -1,4 +1,134 @@
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+# Enough pooled connections per host for every download thread to keep its connection alive (by default). Use
+# set_connection_pool_size when more threads download at once.
+CONNECTION_POOL_SIZE = 16
+
+# Seconds to wait for the server before giving up on a page
+REQUEST_TIMEOUT = 30
+
+# Busy, rate limited or briefly unavailable servers are retried rather than failing the whole gene. Waits follow the
+# server's Retry-After header when it sends one (up to MAX_RETRY_AFTER seconds), otherwise they grow exponentially
+# (RETRY_BACKOFF * 2 ** retry seconds).
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRY_AFTER = 60
+
+
+class _CappedRetry(Retry):
+    """
+    Retry configuration that waits at most MAX_RETRY_AFTER seconds when the server asks for a longer wait with a
+    Retry-After header, so a misbehaving server can not stall a download indefinitely.
+
+    """
+
+    def get_retry_after(self, response):
+        retry_after = super(_CappedRetry, self).get_retry_after(response)
+
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+def _configure_session(session):
+    """
+    Configures a session so that connections are kept alive and reused by subsequent requests to the same host, and
+    failed connections or server errors are retried.
+
+    Args:
+        session (requests.Session): session to configure
+
+    Returns:
+        requests.Session: the configured session
+
+    """
+
+    # Once retries are used up, the last response is returned so its status code is reported as usual
+    retries = _CappedRetry(total=MAX_RETRIES, backoff_factor=RETRY_BACKOFF, status_forcelist=RETRY_STATUS_CODES,
+                           raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=_connection_pool_size, pool_maxsize=_connection_pool_size,
+                          max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    # LOVD pages are repetitive markup that compresses well, always ask for compressed responses (decoded by requests)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    return session
+
+
+# Number of connections kept alive per host, see set_connection_pool_size
+_connection_pool_size = CONNECTION_POOL_SIZE
+
+# Shared by all page requests to avoid a new connection handshake per page
+_session = _configure_session(requests.Session())
+
+
+def set_connection_pool_size(pool_size):
+    """
+    Sets the number of connections kept alive per host by the shared session. Should be at least the number of threads
+    requesting pages at once, otherwise connections are discarded (and reopened) rather than reused. Connections
+    already open are closed.
+
+    Args:
+        pool_size (int): number of connections to keep alive per host
+
+    """
+    global _connection_pool_size
+
+    _connection_pool_size = max(1, pool_size)
+
+    _session.close()
+    _configure_session(_session)
+
+
+def enable_cache(cache_name='leiden_cache', expire_after=86400):
+    """
+    Caches page requests in an on-disk SQLite database so that repeated runs do not download unchanged pages again.
+    Requires the optional requests_cache package.
+
+    Args:
+        cache_name (str): path of the cache database (.sqlite extension is added automatically)
+        expire_after (int): number of seconds a cached page is used before it is requested again
+
+    Returns:
+        bool: True if caching was enabled, False if requests_cache is not installed.
+
+    """
+    global _session
+
+    if requests_cache is None:
+        return False
+
+    _session = _configure_session(requests_cache.CachedSession(cache_name, backend='sqlite', expire_after=expire_after))
+    return True
+
+
+def clear_cache():
+    """
+    Removes all pages from the cache enabled with enable_cache, so they are downloaded again when next requested. Does
+    nothing if caching is not enabled.
+
+    """
+
+    if hasattr(_session, 'cache'):
+        _session.cache.clear()
+
+
+def close_session():
+    """
+    Closes all pooled connections held by the shared session. Later requests open new connections as needed.
+
+    """
+
+    _session.close()
 
 
 def get_page_html(page_url):
@@ -17,7 +147,7 @@ def get_page_html(page_url):
 
     """
 
-    response = requests.get(page_url)
+    response = _session.get(page_url, timeout=REQUEST_TIMEOUT)
 
     if response.status_code == 404:
         raise ValueError('Requested URL not found.')